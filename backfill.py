@@ -0,0 +1,67 @@
+"""
+Fetch past seasons into their own partitions under data/seasons/<season>/ and render their pages there.
+
+    python backfill.py 2022 2023 2024 2025
+    python backfill.py 2024 --skip-pens      # designations only, for seasons missing from PAST_SEASONS
+
+Seasons are fetched concurrently, the requests of all seasons to a same host being paced together
+by the HTTP scheduler. A season only ever reads its own partition, so analyzing one season
+does not depend on how many seasons are stored.
+"""
+import argparse
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import export_design
+import export_pens
+import metrics
+import track_staying_home
+import track_workload
+from designations import load as load_parsed_designations
+
+# Seasons fetched at the same time
+BACKFILL_WORKERS = int(os.environ.get("BACKFILL_WORKERS", 4))
+
+logger = logging.getLogger(__name__)
+
+
+def backfill_season(season: int, pens: bool = True, designations: bool = True):
+    if pens:
+        export_pens.main(season)
+    if designations:
+        parsed = load_parsed_designations(season)
+        export_design.main(parsed, season)
+        # Console reports of concurrent seasons would interleave, only the HTML report is written
+        track_staying_home.main(parsed, season, console=False)
+        track_workload.main(parsed, season, console=False)
+
+
+def backfill(seasons: list, pens: bool = True, designations: bool = True, max_workers: int = BACKFILL_WORKERS) -> bool:
+    """Backfill every season, returns whether they all succeeded"""
+    succeeded = True
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = [(season, executor.submit(backfill_season, season, pens, designations)) for season in seasons]
+        for season, future in futures:
+            try:
+                future.result()
+                logger.info("Season %d backfilled", season)
+            except Exception as e:
+                logger.exception(f"Season {season} failed", exc_info=e)
+                succeeded = False
+    return succeeded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("seasons", type=int, nargs="+", help="Seasons named after their ending year, 2025 is 2024-2025")
+    parser.add_argument("--skip-pens", action="store_true", help="Do not fetch penalties")
+    parser.add_argument("--skip-designations", action="store_true", help="Do not fetch designations")
+    parser.add_argument("--workers", type=int, default=BACKFILL_WORKERS, help="Seasons fetched at the same time")
+    args = parser.parse_args()
+    metrics.configure_logging()
+    succeeded = backfill(args.seasons, not args.skip_pens, not args.skip_designations, args.workers)
+    metrics.write()
+    if not succeeded:
+        sys.exit(1)
@@ -0,0 +1,83 @@
+"""
+Compare the shared columnar designation parser with the former per-stage parsing,
+which matched every referee name with re.match in both export_design and track_staying_home.
+Both sides produce the same things: the denormalized export lines and the parsed games.
+
+    python benchmarks/bench_designations.py [seasons]
+"""
+import csv
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from designations import parse_designations, parse_referee_name, split_teams
+from export_design import designation_lines
+from synthetic import designation_export
+
+
+def legacy_parse(rows: list):
+    """Parsing done by both stages before the shared parser"""
+    lines = []
+    for row in rows:
+        game = row[:5]
+        for teamId in [0, 1]:
+            teamCp = game.copy()
+            teamCp.extend(["Domicile" if teamId == 0 else "Visiteur", row[5].split(' / ', 1)[teamId].split(' - ', 1)[1]])
+            for col in range(6, len(row)):
+                if row[col]:
+                    for refName in row[col].split(', '):
+                        refCp = teamCp.copy()
+                        refMatch = re.match(r"M(?:me)? ([A-Z \-']+) ([A-Z][\w \-']+)", refName)
+                        if refMatch:
+                            refCp.extend(["Arbitre", refMatch.group(1), refMatch.group(2)])
+                            lines.append(refCp)
+    games = []
+    for row in rows:
+        refs = []
+        for col in range(6, 9):
+            for refName in row[col].split(', ') if row[col] else []:
+                refMatch = re.match(r"M(?:me)? ([A-Z \-']+) ([A-Z][\w \-']+)", refName)
+                if refMatch:
+                    refs.append((refMatch.group(1), refMatch.group(2)))
+        games.append({'competition': row[0], 'phase': row[1], 'date': row[2], 'time': row[3],
+                      'location': row[4], 'teams': row[5], 'refs': refs})
+    return lines, games
+
+
+def columnar_parse(rows: list):
+    """Parsing done once for both stages, with the lines export_design writes"""
+    parse_referee_name.cache_clear()
+    split_teams.cache_clear()
+    designations = parse_designations(rows)
+    return list(designation_lines(designations)), designations
+
+
+def measure(function, rows: list) -> tuple:
+    start = time.perf_counter()
+    function(rows)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    result = function(rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, peak
+
+
+def main():
+    seasons = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    reader = csv.reader(designation_export(seasons).splitlines(), delimiter=';', quotechar='"')
+    next(reader)
+    rows = list(reader)
+    print(f"{len(rows)} games over {seasons} season(s)")
+    for name, function in [("legacy", legacy_parse), ("columnar", columnar_parse)]:
+        elapsed, peak = measure(function, rows)
+        print(f"{name:<10} {elapsed * 1000:8.1f} ms  peak {peak / 1024 / 1024:7.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Compare the targeted <live-rencontre-container> extractor with the full BeautifulSoup parse.
+
+Save a few rencontre pages first, e.g.
+    curl -s https://liguemagnus.com/rencontre/<game_id>/ -o game.html
+then run
+    python benchmarks/bench_extract.py game.html [other_game.html ...]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from export_pens import extract_game_data, extract_game_data_bs4
+
+
+def bench(path: str, number: int):
+    with open(path, 'r') as f:
+        page = f.read()
+    if extract_game_data(page) != extract_game_data_bs4(page):
+        print(f"{path}: extractors disagree, skipping")
+        return
+    bs4_time = timeit.timeit(lambda: extract_game_data_bs4(page), number=number) / number
+    scan_time = timeit.timeit(lambda: extract_game_data(page), number=number) / number
+    print(f"{path} ({len(page) / 1024:.0f} KiB): bs4 {bs4_time * 1000:.2f} ms, scan {scan_time * 1000:.3f} ms, x{bs4_time / scan_time:.0f}")
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    number = int(os.environ.get("BENCH_NUMBER", 20))
+    for path in sys.argv[1:]:
+        bench(path, number)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Offline benchmark of every pipeline stage, end to end and in isolation, on synthetic inputs.
+
+    python benchmarks/run.py [--seasons N] [--repeat N] [--save-baseline] [--threshold 0.2]
+
+Each run is appended to benchmarks/history.json. With a benchmarks/baseline.json (written by
+--save-baseline), stages slower than the baseline by more than the threshold are reported
+as regressions and the exit code is 1.
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import parse_qs, urlsplit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+import synthetic
+
+HISTORY_PATH = os.path.join(BENCH_DIR, "history.json")
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+
+
+class SyntheticAdapter(BaseAdapter):
+    """Transport serving synthetic schedules and rencontre pages instead of the real sites"""
+
+    def __init__(self, seasons: int):
+        super().__init__()
+        self.seasons = seasons
+        self.schedules = {}
+
+    def _body(self, request) -> tuple:
+        path = urlsplit(request.url).path
+        if path.endswith("/admin-ajax.php"):
+            form = {key: values[0] for key, values in parse_qs(request.body or "").items()}
+            competition_id = int(form['competition_id'])
+            if competition_id not in self.schedules:
+                self.schedules[competition_id] = synthetic.schedule(competition_id, self.seasons)
+            page = synthetic.schedule_page(self.schedules[competition_id], int(form.get('page') or 1), int(form['par_page']))
+            return "application/json", json.dumps(page)
+        game_id = int(path.rstrip("/").rsplit("/", 1)[1])
+        return "text/html; charset=UTF-8", synthetic.rencontre_page(game_id)
+
+    def send(self, request, **kwargs):
+        content_type, body = self._body(request)
+        response = requests.Response()
+        response.status_code = 200
+        response.headers = CaseInsensitiveDict({"Content-Type": content_type})
+        response.encoding = "utf-8"
+        response._content = body.encode()
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+@contextlib.contextmanager
+def workspace():
+    """Temporary working directory with the templates and an empty data directory"""
+    previous = os.getcwd()
+    directory = tempfile.mkdtemp(prefix="hockeypenstats-bench-")
+    for name in os.listdir(ROOT_DIR):
+        if name.startswith("template_"):
+            shutil.copy(os.path.join(ROOT_DIR, name), directory)
+    os.makedirs(os.path.join(directory, "data"))
+    os.chdir(directory)
+    try:
+        yield directory
+    finally:
+        os.chdir(previous)
+        shutil.rmtree(directory)
+
+
+def timed(function, repeat: int) -> float:
+    """Best wall-clock time of repeat runs, with the stage output silenced"""
+    best = None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            function()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(seasons: int, repeat: int) -> dict:
+    import export_design
+    import export_pens
+    import track_staying_home
+    from designations import parse_designations
+    from http_cache import HttpCache
+
+    reader = csv.reader(synthetic.designation_export(seasons).splitlines(), delimiter=';', quotechar='"')
+    next(reader)
+    rows = list(reader)
+    pages = [synthetic.rencontre_page(game_id) for game_id in range(19700000, 19700000 + 50)]
+
+    session = requests.Session()
+    session.mount("https://", SyntheticAdapter(seasons))
+    export_pens.session = session
+
+    def fresh_pens():
+        # Cold start: empty penalty store and HTTP cache
+        shutil.rmtree("data")
+        os.makedirs("data")
+        export_pens.cache = HttpCache(path="data/http_cache")
+        export_pens.main()
+
+    def cold_game_penalties():
+        # Empty HTTP cache on every repeat, so that each game is fetched and parsed rather than read from the cache
+        shutil.rmtree("data/http_cache", ignore_errors=True)
+        export_pens.cache = HttpCache(path="data/http_cache")
+        return [export_pens.get_game_penalties("https://liguemagnus.com", game_id) for game_id in range(19700000, 19700050)]
+
+    def pipeline():
+        fresh_pens()
+        designations = parse_designations(rows)
+        export_design.main(designations)
+        track_staying_home.main(designations)
+
+    results = {}
+    with workspace():
+        designations = parse_designations(rows)
+        index = track_staying_home.build_index(designations)
+        stages = [
+            ("extract_game_data", lambda: [export_pens.extract_game_data(page) for page in pages]),
+            ("get_game_penalties", cold_game_penalties),
+            ("export_pens", fresh_pens),
+            ("parse_designations", lambda: parse_designations(rows)),
+            ("export_design", lambda: export_design.main(designations)),
+            ("staying_home_index", lambda: track_staying_home.build_index(designations)),
+            ("staying_home_analyze", lambda: track_staying_home.analyze(index)),
+            ("staying_home", lambda: track_staying_home.main(designations)),
+            ("pipeline", pipeline),
+        ]
+        for name, function in stages:
+            results[name] = timed(function, repeat)
+            print(f"{name:<24}{results[name] * 1000:>12.1f} ms")
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seasons", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative slowdown reported as a regression")
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    results = run(args.seasons, args.repeat)
+    entry = {'timestamp': time.time(), 'revision': git_revision(), 'seasons': args.seasons, 'results': results}
+
+    history = []
+    if os.path.exists(HISTORY_PATH):
+        with open(HISTORY_PATH, 'r') as f:
+            history = json.load(f)
+    history.append(entry)
+    with open(HISTORY_PATH, 'w') as f:
+        json.dump(history, f, indent=4)
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(entry, f, indent=4)
+        print(f"Baseline saved to {BASELINE_PATH}")
+        return
+
+    if not os.path.exists(BASELINE_PATH):
+        return
+    with open(BASELINE_PATH, 'r') as f:
+        baseline = json.load(f)
+    if baseline['seasons'] != args.seasons:
+        print(f"Baseline was recorded with {baseline['seasons']} season(s), not comparing")
+        return
+    regressions = []
+    for name, elapsed in results.items():
+        reference = baseline['results'].get(name)
+        if reference and elapsed > reference * (1 + args.threshold):
+            regressions.append(name)
+            print(f"REGRESSION {name}: {reference * 1000:.1f} ms -> {elapsed * 1000:.1f} ms (+{(elapsed / reference - 1) * 100:.0f}%)")
+    if regressions:
+        sys.exit(1)
+    print(f"No regression against baseline {baseline['revision']}")
+
+
+if __name__ == "__main__":
+    main()
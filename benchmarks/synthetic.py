@@ -0,0 +1,120 @@
+"""Synthetic, deterministic inputs shaped like the real ones, scalable in seasons"""
+import html
+import json
+import random
+from datetime import date, timedelta
+
+COMPETITIONS = {
+    'Synerglace Ligue Magnus': 5,
+    'Division 1': 6,
+    'Division 2': 10,
+    'Division 3': 12,
+    'U20 Elite': 6,
+    'U17 Elite': 6,
+    'Féminin Elite': 3,
+}
+LAST_NAMES = ['DUPONT', 'MARTIN', 'DURAND', 'LEROY', 'MOREAU', 'SIMON', 'LAURENT', 'LEFEBVRE', 'MICHEL', 'GARCIA',
+              'DAVID', 'BERTRAND', 'ROUX', 'VINCENT', 'FOURNIER', 'MOREL', 'GIRARD', 'ANDRE', "D'ARC", 'LE-BON']
+FIRST_NAMES = ['Jean', 'Marie', 'Paul', 'Luc', 'Anne', 'Eric', 'Julie', 'Hugo', 'Léa', 'Noé', 'Chloé', 'Louis', 'Emma', 'Théo', 'Inès']
+TEAMS = ['ROUEN', 'GRENOBLE', 'ANGERS', 'BORDEAUX', 'AMIENS', 'GAP', 'CERGY', 'BRIANCON', 'MARSEILLE', 'NICE',
+         'CHAMONIX', 'MULHOUSE', 'ANGLET', 'TOURS', 'NANTES', 'LYON', 'CHOLET', 'CAEN', 'DIJON', 'EPINAL']
+HEADER = 'Compétition;Phase;Date;Heure;Lieu;Rencontre;Arbitre principal;Juge de ligne;Arbitre;Superviseur'
+
+
+def referees(count: int, rng: random.Random) -> list:
+    names = [f"{rng.choice(['M', 'Mme'])} {last} {first}" for last in LAST_NAMES for first in FIRST_NAMES]
+    rng.shuffle(names)
+    return names[:count]
+
+
+def season_days(season: int):
+    """Saturdays and Sundays from September of season - 1 to March of season"""
+    day = date(season - 1, 9, 1)
+    while day < date(season, 4, 1):
+        if day.weekday() >= 5:
+            yield day
+        day += timedelta(days=1)
+
+
+def designation_export(seasons: int = 1, first_season: int = 2026, referee_count: int = 300, seed: int = 0) -> str:
+    """hockeynet ';'-separated designation export, one game per line"""
+    rng = random.Random(seed)
+    pool = referees(referee_count, rng)
+    lines = [HEADER]
+    for season in range(first_season - seasons + 1, first_season + 1):
+        for day in season_days(season):
+            for competition, games in COMPETITIONS.items():
+                for g in range(rng.randint(games // 2, games)):
+                    home, away = rng.sample(TEAMS, 2)
+                    crew = rng.sample(pool, 5)
+                    supervisor = f'"{crew[4]}"' if competition == 'Synerglace Ligue Magnus' else ''
+                    lines.append(f'{competition};Saison régulière;{day:%d/%m/%Y};{rng.randint(14, 20)}:{rng.choice(["00", "30"])};'
+                                 f'Patinoire de {home.title()};1 - {home} / 2 - {away};"{crew[0]}, {crew[1]}";"{crew[2]}, {crew[3]}";;{supervisor}')
+    return "\n".join(lines)
+
+
+SANCTIONS = ['ACC', 'CROS', 'OBST', 'RUD', 'BAT', 'FAC', 'DUR', 'CING', 'MCON', 'RET']
+PAGE_FILLER = '<div class="wp-block-group"><p class="has-text">Lorem ipsum dolor sit amet &amp; consectetur</p><a href="/actualites/">Actualités</a></div>\n'
+
+
+def schedule(competition_id: int, seasons: int = 1, games_per_season: int = 220, finished_ratio: float = 1.0, seed: int = 0) -> list:
+    """Games as returned in data.data by admin-ajax.php get_rencontres"""
+    rng = random.Random(seed + competition_id)
+    games = []
+    for i in range(games_per_season * seasons):
+        home, away = rng.sample(TEAMS, 2)
+        games.append({
+            'id': competition_id * 100000 + i,
+            'etat': 'T' if i < games_per_season * seasons * finished_ratio else 'A',
+            'receveur': {'abreviation': home[:3]},
+            'visiteur': {'abreviation': away[:3]},
+        })
+    return games
+
+
+def schedule_page(games: list, page: int, per_page: int) -> dict:
+    """admin-ajax.php response for one page of a schedule"""
+    return {'success': True, 'data': {
+        'data': games[(page - 1) * per_page:page * per_page],
+        'current_page': page,
+        'last_page': max(1, -(-len(games) // per_page)),
+        'total': len(games),
+    }}
+
+
+def game_data(game_id: int, seed: int = 0) -> dict:
+    """:data payload of a rencontre page"""
+    rng = random.Random(seed + game_id)
+    home, away = rng.sample(TEAMS, 2)
+    events = []
+    for _ in range(rng.randint(4, 16)):
+        team = rng.choice([home, away])
+        events.append({
+            'type': 'SANCTION',
+            'temps': rng.randint(0, 3600),
+            'equipe': {'abreviation': team[:3]},
+            'joueur': {'nom_complet': f"{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)}"} if rng.random() > 0.1 else None,
+            'substitution': {'nom_complet': f"{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)}"} if rng.random() > 0.9 else None,
+            'temps_penalite': rng.choice([None, 2, 2, 2, 4, 5, 10]),
+            'sanction': {'code': rng.choice(SANCTIONS), 'libelle': 'Pénalité mineure'},
+        })
+    for _ in range(rng.randint(3, 10)):
+        events.append({'type': 'BUT', 'temps': rng.randint(0, 3600), 'equipe': {'abreviation': rng.choice([home, away])[:3]}})
+    events.sort(key=lambda event: event['temps'])
+    day = date(2025, 9, 1) + timedelta(days=game_id % 200)
+    return {
+        'id': game_id,
+        'date_rencontre_non_formate': f"{day:%Y-%m-%d} 20:00:00",
+        'receveur': {'abreviation': home[:3], 'nom': home.title()},
+        'visiteur': {'abreviation': away[:3], 'nom': away.title()},
+        'evenements': events,
+    }
+
+
+def rencontre_page(game_id: int, filler_blocks: int = 1200, seed: int = 0) -> str:
+    """WordPress rencontre page embedding the game in a <live-rencontre-container> :data attribute"""
+    payload = html.escape(json.dumps(game_data(game_id, seed)), quote=True)
+    filler = PAGE_FILLER * (filler_blocks // 2)
+    return (f'<!DOCTYPE html><html lang="fr"><head><title>Rencontre {game_id}</title>'
+            f'<script>var settings = {{"ajax": "/wp-admin/admin-ajax.php"}};</script></head><body>{filler}'
+            f'<live-rencontre-container :data="{payload}" :live="false"></live-rencontre-container>{filler}</body></html>')
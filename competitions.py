@@ -0,0 +1,68 @@
+import os
+from typing import NamedTuple
+
+# Season of the hockeynet export and of the league sites, named after its ending year (2026 is 2025-2026)
+SEASON = int(os.environ.get("SEASON", 2026))
+
+# Per season files: data/seasons/<season>/penalties.jsonl, designations_export.csv...
+SEASONS_DIR = "data/seasons"
+# Files written in data/ before storage was partitioned by season, they belong to the current season
+LEGACY_DIR = "data"
+
+
+class Competition(NamedTuple):
+    key: str  # penalty store tag and output name, e.g. data/magnus.html
+    name: str
+    base_url: str
+    competition_id: int
+    phase_id: int
+    season: int = SEASON
+
+
+# Adding a league or phase only requires a new entry here
+COMPETITIONS = [
+    Competition("magnus", "Magnus", "https://liguemagnus.com", 197, 560),
+    Competition("d1", "D1", "https://www.hockeyfrance.com/competitions", 196, 559),
+]
+
+# (competition id, phase id) of each competition in past seasons, backfilling a season only requires its entry here
+PAST_SEASONS = {
+    # 2025: {"magnus": (competition id, phase id), "d1": (competition id, phase id)},
+}
+
+
+def get_competition(key: str) -> Competition:
+    for competition in COMPETITIONS:
+        if competition.key == key:
+            return competition
+    raise KeyError(f"Unknown competition {key}")
+
+
+def season_competitions(season: int) -> list:
+    """Competitions of a season, with the ids the league sites use that season"""
+    if season == SEASON:
+        return COMPETITIONS
+    if season not in PAST_SEASONS:
+        raise KeyError(f"Unknown competition ids for season {season}, add them to PAST_SEASONS")
+    ids = PAST_SEASONS[season]
+    return [competition._replace(competition_id=ids[competition.key][0], phase_id=ids[competition.key][1], season=season)
+            for competition in COMPETITIONS if competition.key in ids]
+
+
+def season_file(season: int, name: str) -> str:
+    return f"{SEASONS_DIR}/{season}/{name}"
+
+
+def output_dir(season: int) -> str:
+    """Pages of the current season are published in data/, past seasons in their own directory"""
+    return "data" if season == SEASON else f"{SEASONS_DIR}/{season}"
+
+
+def migrate_legacy(*names: str):
+    """Move files of the current season still in data/ to its partition"""
+    for name in names:
+        legacy = f"{LEGACY_DIR}/{name}"
+        partition = season_file(SEASON, name)
+        if os.path.exists(legacy) and not os.path.exists(partition):
+            os.makedirs(os.path.dirname(partition), exist_ok=True)
+            os.replace(legacy, partition)
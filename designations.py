@@ -0,0 +1,139 @@
+import csv
+import io
+import re
+import sys
+import threading
+from array import array
+from collections import defaultdict
+from functools import lru_cache
+
+import metrics
+from competitions import SEASON
+import get_design
+
+REFEREE_REGEX = re.compile(r"M(?:me)? ([A-Z \-']+) ([A-Z][\w \-']+)")
+
+# Columns of the export holding the referees of a game, by role
+FIRST_REFEREE_COLUMN = 6
+SUPERVISOR_COLUMN = 9
+
+_lock = threading.Lock()
+_season_locks = defaultdict(threading.Lock)
+_parsed = {}  # season -> Designations
+
+
+@lru_cache(maxsize=None)
+def parse_referee_name(name: str) -> tuple | None:
+    """(last name, first name) of a name like 'M DUPONT Jean', None if it does not match"""
+    refMatch = REFEREE_REGEX.match(name)
+    if refMatch is None:
+        return None
+    return sys.intern(refMatch.group(1)), sys.intern(refMatch.group(2))
+
+
+@lru_cache(maxsize=None)
+def split_teams(teams: str) -> tuple:
+    """(home, away) team names of a '1 - HOME / 2 - AWAY' cell"""
+    return tuple(team.split(' - ', 1)[1] for team in teams.split(' / ', 1))
+
+
+class Designations:
+    """
+    Designation export stored by columns. Every string is interned once in a string table
+    and games only hold ids, the referees of game i are the assignments between
+    ref_start[i] and ref_start[i + 1], each with its export column (the role) and referee id.
+    """
+    __slots__ = ('strings', 'string_ids', 'referees', 'referee_ids',
+                 'competition', 'phase', 'date', 'time', 'location', 'teams',
+                 'ref_start', 'ref_column', 'ref_id', 'skipped', 'unmatched')
+
+    def __init__(self):
+        self.strings = []
+        self.string_ids = {}
+        self.referees = []  # referee id -> (last name, first name)
+        self.referee_ids = {}
+        self.competition = array('I')
+        self.phase = array('I')
+        self.date = array('I')
+        self.time = array('I')
+        self.location = array('I')
+        self.teams = array('I')
+        self.ref_start = array('I', [0])
+        self.ref_column = array('B')
+        self.ref_id = array('I')
+        self.skipped = []  # rows too short to be a game
+        self.unmatched = []  # referee cells with a name in an unexpected format
+
+    def __len__(self) -> int:
+        return len(self.competition)
+
+    def _string(self, value: str) -> int:
+        string_id = self.string_ids.get(value)
+        if string_id is None:
+            string_id = self.string_ids[value] = len(self.strings)
+            self.strings.append(sys.intern(value))
+        return string_id
+
+    def _referee(self, referee: tuple) -> int:
+        referee_id = self.referee_ids.get(referee)
+        if referee_id is None:
+            referee_id = self.referee_ids[referee] = len(self.referees)
+            self.referees.append(referee)
+        return referee_id
+
+    def add_row(self, row: list):
+        if len(row) < 7:
+            self.skipped.append(row)
+            return
+        self.competition.append(self._string(row[0]))
+        self.phase.append(self._string(row[1]))
+        self.date.append(self._string(row[2]))
+        self.time.append(self._string(row[3]))
+        self.location.append(self._string(row[4]))
+        self.teams.append(self._string(row[5]))
+        for col in range(FIRST_REFEREE_COLUMN, len(row)):
+            ref = row[col]
+            if not ref:
+                continue
+            for refName in ref.split(', '):
+                referee = parse_referee_name(refName)
+                if referee is None:
+                    self.unmatched.append(ref)
+                    continue
+                self.ref_column.append(col)
+                self.ref_id.append(self._referee(referee))
+        self.ref_start.append(len(self.ref_id))
+
+    def game(self, i: int) -> tuple:
+        """(competition, phase, date, time, location, teams) of game i"""
+        strings = self.strings
+        return (strings[self.competition[i]], strings[self.phase[i]], strings[self.date[i]],
+                strings[self.time[i]], strings[self.location[i]], strings[self.teams[i]])
+
+    def game_referees(self, i: int, max_column: int = None) -> list:
+        """(column, referee id) of each referee of game i, up to max_column excluded"""
+        return [(self.ref_column[j], self.ref_id[j]) for j in range(self.ref_start[i], self.ref_start[i + 1])
+                if max_column is None or self.ref_column[j] < max_column]
+
+
+def parse_designations(rows: list) -> Designations:
+    designations = Designations()
+    with metrics.span("parse_designations"):
+        for row in rows:
+            designations.add_row(row)
+    return designations
+
+
+def load(season: int = SEASON) -> Designations:
+    """
+    Designation export of a season parsed into columns once per process, shared by every stage.
+    Rows are parsed straight from the export text, which is then dropped: only the columns stay in memory.
+    """
+    with _lock:
+        season_lock = _season_locks[season]
+    with season_lock:
+        if season not in _parsed:
+            reader = csv.reader(io.StringIO(get_design.main(season), newline=""), delimiter=';', quotechar='"')
+            next(reader, None) # Skip header
+            _parsed[season] = parse_designations(reader)
+        return _parsed[season]
@@ -1,6 +1,13 @@
 import csv
-import re
-from get_design import main as get_design
+import logging
+from competitions import SEASON, output_dir
+from designations import Designations, load as load_parsed_designations, split_teams
+import metrics
+from output import open_output
+from render import OUTPUT_MODE, join_chunks, render_template, render_virtual_page, table_rows
+from shards import write_shards
+
+logger = logging.getLogger(__name__)
 
 months = {
     '01': 'Janvier',
@@ -25,52 +32,50 @@ ref_roles = {
     9: 'Superviseur',
 }
 
-def main():
-    lines = []
-    designations = get_design().splitlines()
-    print("Fetched", len(designations) - 1, "designations")
-    reader = csv.reader(designations, delimiter=';', quotechar='"')
-    next(reader) # Skip header
-    for row in reader:
-        if len(row) < 7:
-            print("Skipping invalid row:", row)
-            continue
-        game = [
-            row[0], # Compétition
-            row[1], # Phase
-            row[2], # Date
-            row[3], # Heure
-            row[4], # Lieu
-        ]
-        for teamId in [0, 1]: # Duplicate for home and away teams
-            teamCp = game.copy()
-            teamCp.extend(["Domicile" if teamId == 0 else "Visiteur", row[5].split(' / ', 1)[teamId].split(' - ', 1)[1]])
-            refCols = range(6, len(row))
-            for col in refCols:
-                ref = row[col]
-                if ref:
-                    refNames = ref.split(', ')
-                    for refName in refNames:
-                        refCp = teamCp.copy()
-                        refMatch = re.match(r"M(?:me)? ([A-Z \-']+) ([A-Z][\w \-']+)", refName)
-                        if refMatch:
-                            lastName = refMatch.group(1)
-                            firstName = refMatch.group(2)
-                            refCp.extend([ref_roles.get(col, "Arbitre"), lastName, firstName])
-                            lines.append(refCp)
-                        else:
-                            print("Error: referee name does not match the expected format", ref)
-    print("Processed", len(lines), "designations entries")
-    with open("template_design.html", 'r') as f:
-        html_content = f.read()
-    with open("data/designations.html", 'w') as f:
-        f.write(html_content.replace("%DATA%", "\n".join(["<tr>" + "".join([f"<td>{data}</td>" for data in line]) + "</tr>" for line in lines])))
+def designation_lines(designations: Designations):
+    """
+    One row per game, team and referee, yielded lazily: the game columns are shared by
+    the rows of both teams and each row is only alive until the writers consumed it
+    """
+    for i in range(len(designations)):
+        competition, phase, date, time, location, teams = designations.game(i)
+        refs = [(ref_roles.get(col, "Arbitre"), *designations.referees[referee]) for col, referee in designations.game_referees(i)]
+        for teamId, team in enumerate(split_teams(teams)): # Duplicate for home and away teams
+            teamCp = (competition, phase, date, time, location, "Domicile" if teamId == 0 else "Visiteur", team)
+            for ref in refs:
+                yield teamCp + ref
+
+def main(designations: Designations = None, season: int = SEASON):
+    if designations is None:
+        designations = load_parsed_designations(season)
+    logger.info("Fetched %d designations", len(designations) + len(designations.skipped))
+    for row in designations.skipped:
+        logger.warning("Skipping invalid row: %s", row)
+    for ref in designations.unmatched:
+        logger.error("Referee name does not match the expected format: %s", ref)
 
-    with open("data/designations.csv", "w") as f:
+    count = 0
+    pages = output_dir(season)
+    columns = ["Compétition", "Phase", "Date", "Heure", "Lieu", "Type d'Équipe", "Équipe", "Rôle", "Nom", "Prénom"]
+    with open_output(f"{pages}/designations.csv") as f:
         writer = csv.writer(f)
-        writer.writerow(["Compétition", "Phase", "Date", "Heure", "Lieu", "Type d'Équipe", "Équipe", "Rôle", "Nom", "Prénom"])
-        for line in lines:
-            writer.writerow(line)
+        writer.writerow(columns)
+
+        def write_csv(lines):
+            # Each row goes to the CSV file on its way to the HTML table, in a single pass
+            nonlocal count
+            for line in lines:
+                writer.writerow(line)
+                count += 1
+                yield line
+
+        if OUTPUT_MODE == "sharded":
+            write_shards(f"{pages}/designations", columns, write_csv(designation_lines(designations)), 2)
+            render_virtual_page(f"{pages}/designations.html", "Statistiques Désignations", "designations/index.json")
+        else:
+            render_template("template_design.html", f"{pages}/designations.html", join_chunks(table_rows(write_csv(designation_lines(designations)))))
+    logger.info("Processed %d designations entries", count)
 
 if __name__ == "__main__":
+    metrics.configure_logging()
     main()
\ No newline at end of file
@@ -1,63 +1,153 @@
-import bs4
+import html
 import json
-import requests
+import logging
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from competitions import SEASON, Competition, migrate_legacy, output_dir, season_competitions, season_file
+from http_cache import HttpCache
+from http_client import new_session
+import metrics
+from penalty_stats import PenaltyAggregates, stats_sections
+from penalty_store import PenaltyStore
+from retry_queue import RetryQueue
+from render import OUTPUT_MODE, join_chunks, render_template, render_virtual_page, table_rows
+from shards import write_shards
 
-def get_all_magnus_games():
-    url = "https://liguemagnus.com/wp-admin/admin-ajax.php"
+# Number of game pages fetched in parallel, set to 1 to fetch them sequentially
+MAX_WORKERS = int(os.environ.get("PENS_MAX_WORKERS", 8))
+PAGE_SIZE = 300
+# Upper bound of schedule pages fetched per competition when the response gives no page count
+MAX_SCHEDULE_PAGES = int(os.environ.get("PENS_MAX_SCHEDULE_PAGES", 50))
+
+logger = logging.getLogger(__name__)
+
+session = new_session()
+cache = HttpCache()
+
+LIVE_RENCONTRE_TAG = "<live-rencontre-container"
+LIVE_RENCONTRE_REGEX = re.compile(r"""<live-rencontre-container((?:\s+[^\s=/>]+(?:\s*=\s*(?:"[^"]*"|'[^']*'|[^\s"'>]+))?)*)\s*/?>""", re.IGNORECASE)
+ATTRIBUTE_REGEX = re.compile(r"""([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+)))?""")
+
+INDEX_SECTION = """        <div style="width: 45%;">
+            <button onclick="navigator.clipboard.writeText(document.getElementById('{key}_data').value);"
+                style="background-color: green; color: white; font-weight: bold; height: 50px; width: 250px;">Copier les
+                données {name}</button>
+            <a href="{key}_stats.html">Statistiques {name}</a>
+            <br />
+            <textarea style="width: 100%; height: 100%" id="{key}_data" rows="1500" disabled>{data}</textarea>
+        </div>"""
+# Sharded output mode: the TSV is built in the browser from data/{key}/*.json, see template_index_sharded.html
+INDEX_SECTION_SHARDED = """        <div style="width: 45%;">
+            <button id="{key}_copy" data-source="{key}/index.json"
+                style="background-color: green; color: white; font-weight: bold; height: 50px; width: 250px;">Copier les
+                données {name}</button>
+            <span id="{key}_copy_status"></span>
+            <br />
+            <a href="{key}.html">Pénalités {name}</a> - <a href="{key}_stats.html">Statistiques {name}</a>
+        </div>"""
+PENALTY_COLUMNS = ["Date", "Domicile", "Extérieur", "Temps", "Équipe", "Joueur", "Effectuée par", "Durée", "Pénalité"]
+
+def get_schedule_page(competition: Competition, page: int, date_min: str = "", date_max: str = "", ttl: float = None) -> dict:
+    url = f"{competition.base_url}/wp-admin/admin-ajax.php"
     data = {
         "action": "get_rencontres",
-        "page": "",
+        "page": page,
         "equipe_id": "",
-        "competition_id": 197,
-        "phase_id": 560,
-        "date_min": "",
-        "date_max": "",
-        "par_page": 300,
+        "competition_id": competition.competition_id,
+        "phase_id": competition.phase_id,
+        "date_min": date_min,
+        "date_max": date_max,
+        "par_page": PAGE_SIZE,
         "journee": "",
         "limite": 0
     }
-    response = requests.post(url, data=data)
-    return response.json()
+    response = cache.request(session, "POST", url, data=data, ttl=ttl)
+    response.raise_for_status()
+    return response.json()['data']
 
-def get_all_d1_games():
-    url = "https://www.hockeyfrance.com/competitions/wp-admin/admin-ajax.php"
-    data= {
-        "action": "get_rencontres",
-        "page": "",
-        "equipe_id": "",
-        "competition_id": 196,
-        "phase_id": 559,
-        "date_min": "",
-        "date_max": "",
-        "par_page": 300,
-        "journee": "",
-        "limite": 0
-    }
-    response = requests.post(url, data=data)
-    return response.json()
+def get_schedules(competitions, max_workers: int = MAX_WORKERS, date_min: str = "", date_max: str = "", ttl: float = None) -> dict:
+    """
+    Fetch every schedule page of each competition, all competitions and pages concurrently,
+    optionally only the games between date_min and date_max (YYYY-MM-DD)
+    Returns the games of each competition keyed by competition key
+    """
+    pages = {competition.key: {} for competition in competitions}
+    seen = {competition.key: set() for competition in competitions}  # game ids of the pages fetched
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        pending = [(competition, 1) for competition in competitions]
+        while pending:
+            futures = [(competition, page, executor.submit(get_schedule_page, competition, page, date_min, date_max, ttl)) for competition, page in pending]
+            pending = []
+            for competition, page, future in futures:
+                result = future.result()
+                ids = {game['id'] for game in result['data']}
+                if 'last_page' not in result and page > 1 and ids <= seen[competition.key]:
+                    # The endpoint ignored the page number and sent a page again
+                    logger.warning("Page %d of the %s schedule has no new game, stopping there", page, competition.name)
+                    continue
+                seen[competition.key] |= ids
+                pages[competition.key][page] = result['data']
+                if 'last_page' in result:
+                    # Page count known after the first page, fetch all the others at once
+                    if page == 1:
+                        pending.extend((competition, p) for p in range(2, int(result['last_page']) + 1))
+                elif len(result['data']) >= PAGE_SIZE:
+                    if page < MAX_SCHEDULE_PAGES:
+                        pending.append((competition, page + 1))
+                    else:
+                        logger.warning("Stopped the %s schedule after %d pages", competition.name, page)
+    return {key: [game for page in sorted(games) for game in games[page]] for key, games in pages.items()}
 
-def get_game_penalties(base_url, game_id: int) -> str:
-    url = f"{base_url}/rencontre/{game_id}/"
-    response = requests.get(url)
+def extract_game_data(page: str) -> str | None:
     """
-    Extract attributes from the <live-rencontre-container> element
+    Return the unescaped :data attribute of the first <live-rencontre-container> element
+    by scanning the page for that tag only, or None if it cannot be found
     """
-    soup = bs4.BeautifulSoup(response.text, 'html.parser')
+    start = page.find(LIVE_RENCONTRE_TAG)
+    if start == -1:
+        return None
+    tag = LIVE_RENCONTRE_REGEX.match(page, start)
+    if tag is None:
+        return None
+    for attribute in ATTRIBUTE_REGEX.finditer(tag.group(1)):
+        if attribute.group(1).lower() == ':data':
+            value = next((v for v in attribute.group(2, 3, 4) if v is not None), "")
+            return html.unescape(value)
+    return None
+
+def extract_game_data_bs4(page: str) -> str:
+    """
+    Extract attributes from the <live-rencontre-container> element with a full parse of the page
+    """
+    import bs4  # Only loaded for pages the scan cannot handle
+    soup = bs4.BeautifulSoup(page, 'html.parser')
     live_rencontre_container = soup.find('live-rencontre-container')
-    game_data = json.loads(live_rencontre_container.attrs[':data'])
+    return live_rencontre_container.attrs[':data']
+
+def get_game_penalties(base_url, game_id: int) -> list:
+    url = f"{base_url}/rencontre/{game_id}/"
+    response = cache.request(session, "GET", url)
+    response.raise_for_status()
+    with metrics.span("parse_game"):
+        raw_data = extract_game_data(response.text)
+        if raw_data is None:
+            metrics.inc("parse_game_fallback_total")
+            raw_data = extract_game_data_bs4(response.text)
+        game_data = json.loads(raw_data)
     # with open(f"game_{game_id}.json", 'w') as f:
     #     json.dump(game_data, f, indent=4)
 
     game_events = game_data['evenements']
     game_penalties = [event for event in game_events if event['type'] == 'SANCTION']
 
-    print(len(game_penalties), "penalties in game", game_id)
+    logger.debug("%d penalties in game %s", len(game_penalties), game_id)
+    metrics.inc("penalties_total", len(game_penalties))
 
     formatted_penalties = []
     for penalty in game_penalties:
         if penalty['sanction'] is None:
-            print("Penalty without sanction in game", url)
+            logger.warning("Penalty without sanction in game %s", url)
             continue
         formatted_penalty = [
             "/".join(game_data['date_rencontre_non_formate'].split(' ')[0].replace('-', '/').split('/')[::-1]),
@@ -70,79 +160,125 @@ def get_game_penalties(base_url, game_id: int) -> str:
             f"{penalty['temps_penalite'] if penalty['temps_penalite'] else 2}:00",
             penalty['sanction']['code'],
         ]
-        formatted_penalties.append(formatted_penalty)
-
-    formatted_dump = "\n".join("\t".join(str(cell) for cell in row) for row in formatted_penalties)
-
-    # with open(f"game_{game_id}_penalties.txt", 'w') as f:
-    #     f.write(formatted_dump)
-    return formatted_dump
-
-def main():
-    magnus_games = get_all_magnus_games()
-    finished_magnus_games = [game for game in magnus_games['data']['data'] if game['etat'] == 'T']
-    print(len(finished_magnus_games), "out of", len(magnus_games['data']['data']), "Magnus games are finished")
-    # Check if file exists
-    if os.path.exists("data/finished_games.json"):
-        with open("data/finished_games.json", 'r') as f:
-            data = json.load(f)
+        formatted_penalties.append([str(cell) for cell in formatted_penalty])
+
+    return formatted_penalties
+
+def fetch_games_penalties(base_url, game_ids, max_workers: int = MAX_WORKERS, errors: dict = None) -> dict:
+    """Fetch the penalties of several games concurrently, failed games are left out and their error put in errors"""
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = [(game_id, executor.submit(get_game_penalties, base_url, game_id)) for game_id in game_ids]
+        # Collect in submission order so the merged data does not depend on completion order
+        for game_id, future in futures:
+            try:
+                results[game_id] = future.result()
+                metrics.inc("games_fetched_total")
+            except Exception as e:
+                metrics.inc("games_failed_total")
+                logger.error("Error processing game %s: %s", game_id, e)
+                if errors is not None:
+                    errors[game_id] = repr(e)
+    return results
+
+def competition_rows(store: PenaltyStore, game_ids):
+    for game_id in game_ids:
+        for penalty in store.by_game(game_id):
+            yield penalty.to_row()
+
+def index_sections(store: PenaltyStore, competitions: list, finished_games: dict):
+    """Copy-to-clipboard section of each competition, with its rows as TSV"""
+    head, tail = INDEX_SECTION.split("{data}")
+    for i, competition in enumerate(competitions):
+        if i:
+            yield "\n"
+        yield head.format(key=competition.key, name=competition.name)
+        yield from join_chunks("\t".join(row) for row in competition_rows(store, finished_games[competition.key]))
+        yield tail
+
+def finished_ids(games: list) -> list:
+    return [game['id'] for game in games if game['etat'] == 'T']
+
+def ingest(store: PenaltyStore, retry_queue: RetryQueue, competition: Competition, game_ids: list) -> list:
+    """Fetch the finished games missing from the store, returns the ids of the games stored"""
+    new_games = [game_id for game_id in game_ids if game_id not in store]
+    # Games that failed in a previous run wait for their backoff delay before being tried again
+    due_games = [game_id for game_id in new_games if retry_queue.due(game_id)]
+    retried = sum(1 for game_id in due_games if game_id in retry_queue)
+    if retried or len(due_games) < len(new_games):
+        logger.info("Retrying %d failed %s games, %d still waiting", retried, competition.name, len(new_games) - len(due_games))
+    errors = {}
+    stored = []
+    for game_id, rows in fetch_games_penalties(competition.base_url, due_games, errors=errors).items():
+        store.append(game_id, competition.key, rows)
+        retry_queue.succeeded(game_id)
+        stored.append(game_id)
+    for game_id, error in errors.items():
+        retry_queue.failed(game_id, competition.key, error)
+    if stored or errors:
+        retry_queue.save()
+    return stored
+
+def update_aggregates(aggregates: PenaltyAggregates, store: PenaltyStore):
+    # Only the games stored since the previous update are added to the aggregates
+    applied = aggregates.sync(store)
+    if applied:
+        aggregates.save()
+        logger.info("Added %d games to the penalty aggregates", applied)
+
+def render_competition(store: PenaltyStore, aggregates: PenaltyAggregates, competition: Competition, game_ids: list, pages: str):
+    """Penalty table and statistics pages of a competition"""
+    rows = competition_rows(store, game_ids)
+    if OUTPUT_MODE == "sharded":
+        write_shards(f"{pages}/{competition.key}", PENALTY_COLUMNS, rows, 0)
+        render_virtual_page(f"{pages}/{competition.key}.html", f"Pénalités {competition.name}", f"{competition.key}/index.json")
     else:
-        data = {}
-    for game in finished_magnus_games:
-        if str(game['id']) in data:
-            continue
-        try:
-            data[game['id']] = get_game_penalties("https://liguemagnus.com", game['id'])
-        except Exception as e:
-            print("Error processing game", game['id'], ":", e)
+        render_template("template_table.html", f"{pages}/{competition.key}.html", join_chunks(table_rows(rows)))
+    render_template("template_stats.html", f"{pages}/{competition.key}_stats.html",
+                    stats_sections(competition.name, aggregates.competitions[competition.key]), placeholder="%SECTIONS%")
 
-    d1_games = get_all_d1_games()
-    finished_d1_games = [game for game in d1_games['data']['data'] if game['etat'] == 'T']
-    print(len(finished_d1_games), "out of", len(d1_games['data']['data']), "D1 games are finished")
+def render_index(store: PenaltyStore, competitions: list, finished_games: dict, pages: str):
+    if OUTPUT_MODE == "sharded":
+        sections = (INDEX_SECTION_SHARDED.format(key=competition.key, name=competition.name) for competition in competitions)
+        render_template("template_index_sharded.html", f"{pages}/index.html", join_chunks(sections), placeholder="%SECTIONS%")
+        return
+    render_template("template_index.html", f"{pages}/index.html", index_sections(store, competitions, finished_games), placeholder="%SECTIONS%")
 
-    for game in finished_d1_games:
-        if str(game['id']) in data:
-            continue
-        try:
-            data[game['id']] = get_game_penalties("https://www.hockeyfrance.com/competitions", game['id'])
-        except Exception as e:
-            print("Error processing game", game['id'], ":", e)
+def main(season: int = SEASON):
+    """Fetch the penalties of a season's finished games into its partition and render its pages"""
+    competitions = season_competitions(season)
+    pages = output_dir(season)
+    if season == SEASON:
+        migrate_legacy("penalties.jsonl", "penalty_aggregates.json", "retry_queue.json")
+    store = PenaltyStore(season_file(season, "penalties.jsonl"))
+    retry_queue = RetryQueue(season_file(season, "retry_queue.json"))
 
-    with open("data/finished_games.json", 'w') as f:
-        json.dump(data, f, indent=4)
+    schedules = get_schedules(competitions)
+    finished_games = {}
+    for competition in competitions:
+        games = schedules[competition.key]
+        finished_games[competition.key] = finished_ids(games)
+        logger.info("%d out of %d %s %d games are finished", len(finished_games[competition.key]), len(games), competition.name, season)
 
-    magnus_lines = []
-    for game in finished_magnus_games:
-        if str(game['id']) not in data:
-            continue
-        penalties = data[str(game['id'])].split("\n")
-        for penalty in penalties:
-            penalty_data = penalty.split("\t")
-            line = "".join([f"<td>{data}</td>" for data in penalty_data])
-            magnus_lines.append(f"<tr>{line}</tr>")
-    d1_lines = []
-    for game in finished_d1_games:
-        if str(game['id']) not in data:
-            continue
-        penalties = data[str(game['id'])].split("\n")
-        for penalty in penalties:
-            penalty_data = penalty.split("\t")
-            line = "".join([f"<td>{data}</td>" for data in penalty_data])
-            d1_lines.append(f"<tr>{line}</tr>")
-    with open("template_table.html", 'r') as f:
-        html_content = f.read()
-    with open("data/magnus.html", 'w') as f:
-        f.write(html_content.replace("%DATA%", "\n".join(magnus_lines)))
-    with open("data/d1.html", 'w') as f:
-        f.write(html_content.replace("%DATA%", "\n".join(d1_lines)))
-
-    magnus_lines = [data[str(game['id'])] for game in finished_magnus_games if str(game['id']) in data]
-    d1_lines = [data[str(game['id'])] for game in finished_d1_games if str(game['id']) in data]
-    with open("template_index.html", 'r') as f:
-        html_content = f.read()
-    with open("data/index.html", 'w') as f:
-        f.write(html_content.replace("%MAGNUS_DATA%", "\n".join(magnus_lines)).replace("%D1_DATA%", "\n".join(d1_lines)))
+    if season == SEASON:
+        imported = store.import_legacy(finished_games)
+        if imported:
+            logger.info("Imported %d games from data/finished_games.json", imported)
+
+    for competition in competitions:
+        ingest(store, retry_queue, competition, finished_games[competition.key])
+    cache.save()
+    if retry_queue:
+        logger.warning("%d games are queued for a retry in %s", len(retry_queue), retry_queue.path)
+
+    aggregates = PenaltyAggregates(season_file(season, "penalty_aggregates.json"))
+    update_aggregates(aggregates, store)
+
+    for competition in competitions:
+        render_competition(store, aggregates, competition, finished_games[competition.key], pages)
+    render_index(store, competitions, finished_games, pages)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    metrics.configure_logging()
+    main()
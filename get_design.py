@@ -1,7 +1,20 @@
+import argparse
+import csv
+import hashlib
+import json
 import requests
 import re
 import logging
 import os
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from competitions import SEASON, migrate_legacy, season_file
+from http_client import new_session
+import metrics
+
+logger = logging.getLogger(__name__)
 
 HTTP_HEADERS = {
     'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/112.0',
@@ -11,36 +24,58 @@ HTTP_HEADERS = {
     }
 CSRF_REFEX = r"name=\"csrf-token\" content=\"([^\"]+)\""
 
-LOCAL_FILE_PATH = "data/designations_export.csv"
+EXPORT_FILE = "designations_export.csv"
+META_FILE = "designations_export.meta.json"
+DIFF_FILE = "designations_diff.json"
+# Export of the current season, the input of the designation stages
+LOCAL_FILE_PATH = season_file(SEASON, EXPORT_FILE)
+# Age in seconds after which the local export of the current season is downloaded again,
+# a negative value never expires it. Exports of past seasons never expire.
+MAX_AGE = int(os.environ.get("DESIGN_MAX_AGE", 6 * 3600))
+# Refreshes only download the designations from this many days ago to the end of the season,
+# earlier dates are kept from the local export
+SYNC_PAST_DAYS = int(os.environ.get("DESIGN_SYNC_PAST_DAYS", 14))
+# Age in seconds after which the whole season is downloaded again, to catch late changes to past dates
+FULL_SYNC_AGE = int(os.environ.get("DESIGN_FULL_SYNC_AGE", 7 * 24 * 3600))
+# Download the whole season on every refresh
+FULL_SYNC = bool(os.environ.get("DESIGN_FULL_SYNC"))
+DATE_COLUMN = 2
+
+# Shared by every stage of the process, see get_session and main
+_lock = threading.RLock()
+_season_locks = defaultdict(threading.RLock)
+_session = None
+_fetched = set()  # seasons whose local export is up to date for the rest of the process
 
 def extractToken(page: str) -> str:
     token = re.findall(CSRF_REFEX, page)
     if len(token) == 0:
-        logging.error("Could not find token")
+        logger.error("Could not find token")
         raise Exception("Could not find token")
     return token[0]
 
 def sendRequest(s: requests.Session, url: str, method: str, data: dict = None) -> requests.Response:
-    page = s.request(method, url, headers=HTTP_HEADERS, json=data, timeout=10)
+    # Timeout, retries and pacing are handled by the session, see http_client.RequestScheduler
+    page = s.request(method, url, headers=HTTP_HEADERS, json=data)
     try:
         page.raise_for_status()
     except Exception as e:
-        logging.exception(f"An error occured while fetching {url}")
+        logger.exception(f"An error occured while fetching {url}")
         raise e
     return page
 
-def getAllDesignations(s: requests.Session) -> str:
+def getAllDesignations(s: requests.Session, season: int = SEASON, dates: dict = None) -> str:
     data = {
         "etat": None,
         "competitions_ids": [],
         "phases_ids": [],
-        "dates": {},
+        "dates": dates or {},
         "role_id": None,
         "etat_rencontre": None,
         "lieu_pratique": None,
         "horaire": None,
         "libelle": None,
-        "saison": 2026,
+        "saison": season,
         "discipline_code": "HG",
         "show_all": False
     }
@@ -48,19 +83,137 @@ def getAllDesignations(s: requests.Session) -> str:
     return page.text
     
 
-def main() -> str:
-    # if local file exists, use it
-    if os.path.exists(LOCAL_FILE_PATH):
-        with open(LOCAL_FILE_PATH, 'r') as f:
-            return f.read()
-    logging.getLogger().addHandler(logging.StreamHandler())
-    logging.getLogger().setLevel(logging.DEBUG)
-    requests_log = logging.getLogger("requests.packages.urllib3")
-    requests_log.setLevel(logging.DEBUG)
-    requests_log.propagate = True
+def read_meta(season: int = SEASON) -> dict:
+    path = season_file(season, META_FILE)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+    return {}
+
+def write_meta(meta: dict, season: int = SEASON):
+    with open(season_file(season, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=4)
+
+def content_hash(export: str) -> str:
+    return hashlib.sha256(export.encode()).hexdigest()
+
+def is_fresh(meta: dict, season: int = SEASON) -> bool:
+    path = season_file(season, EXPORT_FILE)
+    if not os.path.exists(path):
+        return False
+    if MAX_AGE < 0 or season < SEASON:
+        return True
+    fetched_at = meta.get('fetched_at', os.path.getmtime(path))
+    return time.time() - fetched_at < MAX_AGE
+
+def row_key(row: list) -> str:
+    # Competition, phase, date and teams identify a game, anything else is a change
+    return "|".join(row[i] for i in (0, 1, 2, 5) if i < len(row))
+
+def diff_designations(previous: str, current: str) -> dict:
+    """Rows added, removed and changed between two designation exports"""
+    def index(export: str) -> dict:
+        reader = csv.reader(export.splitlines(), delimiter=';', quotechar='"')
+        next(reader, None) # Skip header
+        return {row_key(row): row for row in reader if row}
+    before = index(previous)
+    after = index(current)
+    return {
+        'added': [after[key] for key in after if key not in before],
+        'removed': [before[key] for key in before if key not in after],
+        'changed': [{'before': before[key], 'after': after[key]} for key in after if key in before and before[key] != after[key]],
+    }
+
+def dates_filter(start: date, end: date) -> dict:
+    """Value of the export's dates filter, as sent by the date range picker of the designation page"""
+    return {"startDate": start.isoformat(), "endDate": end.isoformat()}
+
+def sync_window(season: int, today: date = None) -> tuple:
+    """First and last dates downloaded by an incremental refresh: recent past days up to the end of the season"""
+    today = today or date.today()
+    return today - timedelta(days=SYNC_PAST_DAYS), date(season, 7, 31)
+
+def row_date(row: list) -> date | None:
+    try:
+        return datetime.strptime(row[DATE_COLUMN], "%d/%m/%Y").date()
+    except (IndexError, ValueError):
+        return None
+
+def dated_lines(export: str) -> tuple:
+    """Header and (date, line) of each row of an export"""
+    lines = export.splitlines()
+    if not lines:
+        return None, []
+    return lines[0], [(row_date(row), line) for line, row in zip(lines[1:], csv.reader(lines[1:], delimiter=';', quotechar='"'))]
+
+def by_date(header: str, rows: list) -> str:
+    """
+    Export with its rows sorted by date, rows of a same date keeping the order they were sent in.
+    Full and incremental downloads of the same designations then give the same file.
+    """
+    rows = sorted(rows, key=lambda row: row[0] or date.min)
+    return "\n".join([header] + [line for _, line in rows]) + "\n"
+
+def merge_window(previous: str, window: str, start: date, end: date) -> str:
+    """Local export with the rows dated from start to end replaced by those of the window export"""
+    previous_header, previous_rows = dated_lines(previous)
+    header, window_rows = dated_lines(window)
+    kept = [(day, line) for day, line in previous_rows if day is None or not start <= day <= end]
+    # Rows outside the requested dates are ignored, in case the filter was not applied
+    within = [(day, line) for day, line in window_rows if day is not None and start <= day <= end]
+    return by_date(header or previous_header, kept + within)
+
+def download(meta: dict, season: int, previous: str, full: bool = False) -> str:
+    """Whole season export, or the local one with the sync window downloaded again"""
+    full = full or FULL_SYNC or not previous or season < SEASON or time.time() - meta.get('full_synced_at', 0) > FULL_SYNC_AGE
+    if not full:
+        start, end = sync_window(season)
+        try:
+            window = getAllDesignations(get_session(), season, dates_filter(start, end))
+            # A response without the export header is not an export, the local rows must not be replaced by it
+            if window.split("\n", 1)[0].strip() != previous.split("\n", 1)[0].strip():
+                raise ValueError("Unexpected response to the dates filter")
+        except (requests.RequestException, ValueError) as e:
+            logger.warning("Could not download the designations of %d from %s to %s, downloading the whole season: %s", season, start, end, e)
+            metrics.inc("designation_sync_total", mode="window_failed")
+        else:
+            metrics.inc("designation_sync_total", mode="window")
+            logger.info("Downloaded %d designations of %d from %s to %s", len(window.splitlines()) - 1, season, start, end)
+            return merge_window(previous, window, start, end)
+    export = by_date(*dated_lines(getAllDesignations(get_session(), season)))
+    meta['full_synced_at'] = time.time()
+    metrics.inc("designation_sync_total", mode="full")
+    logger.info("Downloaded all %d designations of %d", len(export.splitlines()) - 1, season)
+    return export
+
+def refresh(meta: dict, season: int = SEASON, full: bool = False) -> str:
+    """Download the export and record its hash, and the diff with the previous snapshot if it changed"""
+    path = season_file(season, EXPORT_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    previous = ""
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            previous = f.read()
+    export = download(meta, season, previous, full)
+    new_hash = content_hash(export)
+    if new_hash != meta.get('hash'):
+        diff = diff_designations(previous, export)
+        diff.update({'previous_hash': meta.get('hash'), 'hash': new_hash})
+        with open(season_file(season, DIFF_FILE), 'w') as f:
+            json.dump(diff, f, indent=4, ensure_ascii=False)
+        logger.info("Designations %d changed: %d added, %d removed, %d changed", season, len(diff['added']), len(diff['removed']), len(diff['changed']))
+    # Also written back when it was deleted while its meta file was kept
+    if new_hash != meta.get('hash') or not os.path.exists(path):
+        with open(path, 'w') as f:
+            f.write(export)
+    meta.update({'hash': new_hash, 'fetched_at': time.time()})
+    write_meta(meta, season)
+    return export
+
+def login() -> requests.Session:
     if 'X-CSRF-TOKEN' in HTTP_HEADERS:
         del HTTP_HEADERS['X-CSRF-TOKEN']
-    s = requests.Session()
+    s = new_session()
     loginPage = sendRequest(s, "https://hockeynet.fr/auth/login", "GET")
     sendRequest(s, "https://hockeynet.fr/auth/login", "POST", {
         '_token': extractToken(loginPage.text),
@@ -69,7 +222,47 @@ def main() -> str:
     })
     pageDesignation = sendRequest(s, "https://hockeynet.fr/arbitrage/designation", "GET")
     HTTP_HEADERS['X-CSRF-TOKEN'] = extractToken(pageDesignation.text)
-    return getAllDesignations(s)
+    return s
+
+def get_session() -> requests.Session:
+    """Authenticated hockeynet session, logged in once per process"""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = login()
+        return _session
+
+def season_lock(season: int) -> threading.RLock:
+    """Lock of a season's export, so that several seasons can be loaded concurrently"""
+    with _lock:
+        return _season_locks[season]
+
+def main(season: int = SEASON, full: bool = False) -> str:
+    """
+    Raw designation export of a season, downloaded at most once per process. It is not kept
+    in memory: callers parse it and drop it, see designations.load.
+    full downloads the whole season instead of the sync window, even if the local export is fresh.
+    """
+    with season_lock(season):
+        if season == SEASON:
+            migrate_legacy(EXPORT_FILE, META_FILE, DIFF_FILE)
+        meta = read_meta(season)
+        # if local file is recent enough, use it
+        if (season in _fetched or is_fresh(meta, season)) and not full:
+            with open(season_file(season, EXPORT_FILE), 'r') as f:
+                export = f.read()
+            if 'hash' not in meta:
+                meta['hash'] = content_hash(export)
+                write_meta(meta, season)
+        else:
+            export = refresh(meta, season, full)
+        _fetched.add(season)
+        return export
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Download the designation export")
+    parser.add_argument("--season", type=int, default=SEASON)
+    parser.add_argument("--full", action="store_true", help="Download the whole season instead of the recent and future dates")
+    args = parser.parse_args()
+    metrics.configure_logging()
+    main(args.season, args.full)
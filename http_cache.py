@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import urlencode
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+import metrics
+
+CACHE_PATH = os.environ.get("HTTP_CACHE_PATH", "data/http_cache")
+# Total size of the cached bodies, least recently used entries are evicted above it
+MAX_BYTES = int(os.environ.get("HTTP_CACHE_MAX_BYTES", 50 * 1024 * 1024))
+# How long a response without ETag/Last-Modified is served without asking the server again
+TTL = int(os.environ.get("HTTP_CACHE_TTL", 15 * 60))
+
+STORED_HEADERS = ["Content-Type", "ETag", "Last-Modified"]
+
+
+def cache_key(method: str, url: str, data: dict = None) -> str:
+    body = urlencode(sorted((data or {}).items()), doseq=True)
+    return hashlib.sha256(f"{method.upper()} {url}\n{body}".encode()).hexdigest()
+
+
+class HttpCache:
+    """
+    On-disk cache of successful responses keyed by method, URL and form body.
+    Responses carrying an ETag or Last-Modified header are revalidated with a conditional
+    request on every use, the others are reused as is until their TTL expires.
+    Hits and revalidations only update the index in memory, it is written when a response is
+    stored and by save(), which callers run at the end of their fetches.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = MAX_BYTES, ttl: int = TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._index_path = os.path.join(path, "index.json")
+        self._index = {}
+        self._dirty = False  # access or revalidation times not written yet
+        if os.path.exists(self._index_path):
+            with open(self._index_path, 'r') as f:
+                self._index = json.load(f)
+
+    def _body_path(self, key: str) -> str:
+        return os.path.join(self.path, key)
+
+    def _save_index(self):
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self._index_path)
+        self._dirty = False
+
+    def save(self):
+        """Write the access and revalidation times recorded in memory since the last write"""
+        with self._lock:
+            if self._dirty:
+                self._save_index()
+
+    def _lookup(self, key: str):
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None, None
+            try:
+                with open(self._body_path(key), 'rb') as f:
+                    body = f.read()
+            except FileNotFoundError:
+                del self._index[key]
+                self._dirty = True
+                return None, None
+            entry['accessed_at'] = time.time()
+            self._dirty = True
+            return dict(entry), body
+
+    def _store(self, key: str, url: str, response: requests.Response):
+        headers = {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            with open(self._body_path(key), 'wb') as f:
+                f.write(response.content)
+            now = time.time()
+            self._index[key] = {
+                'url': url,
+                'headers': headers,
+                'encoding': response.encoding,
+                'size': len(response.content),
+                'stored_at': now,
+                'accessed_at': now,
+            }
+            self._evict()
+            self._save_index()
+
+    def _touch(self, key: str):
+        with self._lock:
+            if key in self._index:
+                self._index[key]['stored_at'] = time.time()
+                self._dirty = True
+
+    def _evict(self):
+        total = sum(entry['size'] for entry in self._index.values())
+        for key in sorted(self._index, key=lambda k: self._index[k]['accessed_at']):
+            if total <= self.max_bytes:
+                break
+            total -= self._index.pop(key)['size']
+            try:
+                os.remove(self._body_path(key))
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _response(url: str, entry: dict, body: bytes) -> requests.Response:
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.encoding = entry['encoding']
+        response._content = body
+        return response
+
+    def request(self, session: requests.Session, method: str, url: str, data: dict = None, ttl: float = None, **kwargs) -> requests.Response:
+        """Cached response, ttl overrides the cache TTL for this request (0 to always revalidate)"""
+        key = cache_key(method, url, data)
+        entry, body = self._lookup(key)
+        headers = dict(kwargs.pop('headers', None) or {})
+        if entry is not None:
+            validators = entry['headers']
+            if 'ETag' not in validators and 'Last-Modified' not in validators:
+                if time.time() - entry['stored_at'] < (self.ttl if ttl is None else ttl):
+                    metrics.inc("http_cache_total", result="fresh")
+                    return self._response(url, entry, body)
+            else:
+                if 'ETag' in validators:
+                    headers['If-None-Match'] = validators['ETag']
+                if 'Last-Modified' in validators:
+                    headers['If-Modified-Since'] = validators['Last-Modified']
+
+        response = session.request(method, url, data=data, headers=headers, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            metrics.inc("http_cache_total", result="revalidated")
+            self._touch(key)
+            return self._response(url, entry, body)
+        metrics.inc("http_cache_total", result="miss")
+        if response.status_code == 200:
+            self._store(key, url, response)
+        return response
@@ -0,0 +1,202 @@
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+import metrics
+import replay
+
+# Upper bound of simultaneous requests sent to a single host
+PER_HOST_LIMIT = int(os.environ.get("HTTP_PER_HOST_LIMIT", 4))
+# Token bucket of each host: sustained requests per second and burst size, a rate of 0 disables it
+HTTP_RATE = float(os.environ.get("HTTP_RATE", 5))
+HTTP_BURST = int(os.environ.get("HTTP_BURST", 5))
+# Seconds before giving up on a connection or a response when the caller sets no timeout
+HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", 20))
+HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", 4))
+HTTP_BACKOFF_BASE = float(os.environ.get("HTTP_BACKOFF_BASE", 0.5))
+HTTP_BACKOFF_MAX = float(os.environ.get("HTTP_BACKOFF_MAX", 30))
+# Responses slower than this shrink the concurrency of their host like a throttling response
+HTTP_SLOW_RESPONSE = float(os.environ.get("HTTP_SLOW_RESPONSE", 5))
+# Consecutive failures opening the circuit of a host, and seconds before a probe request is let through
+HTTP_BREAKER_THRESHOLD = int(os.environ.get("HTTP_BREAKER_THRESHOLD", 5))
+HTTP_BREAKER_COOLDOWN = float(os.environ.get("HTTP_BREAKER_COOLDOWN", 60))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised without sending the request while the circuit of its host is open"""
+
+
+def record_response(response: requests.Response, *args, **kwargs):
+    host = urlsplit(response.url).netloc
+    metrics.inc("http_requests_total", host=host, method=response.request.method, status=response.status_code)
+    metrics.inc("http_response_bytes_total", len(response.content), host=host)
+    metrics.observe("http_request_seconds", response.elapsed.total_seconds(), host=host)
+
+
+class HostState:
+    def __init__(self, limit: int, burst: int):
+        self.condition = threading.Condition()
+        self.limit = float(limit)  # concurrency allowed right now, between 1 and the scheduler limit
+        self.in_flight = 0
+        self.tokens = float(burst)
+        self.refilled_at = time.monotonic()
+        self.failures = 0  # consecutive
+        self.opened_at = None  # when the circuit opened, None while closed
+        self.probing = False
+
+
+class RequestScheduler:
+    """
+    Pace the requests of each host: a token bucket bounds their rate, and the number in flight
+    grows by one per round of successes and halves on throttling, errors or slow responses (AIMD).
+    Failed requests are retried with exponential backoff and full jitter, and a host failing
+    repeatedly has its circuit opened: requests fail immediately until a probe succeeds.
+    """
+
+    def __init__(self, limit: int = PER_HOST_LIMIT, rate: float = HTTP_RATE, burst: int = HTTP_BURST,
+                 max_retries: int = HTTP_MAX_RETRIES, breaker_threshold: int = HTTP_BREAKER_THRESHOLD,
+                 breaker_cooldown: float = HTTP_BREAKER_COOLDOWN):
+        self.max_limit = max(1, limit)
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_retries = max_retries
+        self.breaker_threshold = max(1, breaker_threshold)
+        self.breaker_cooldown = breaker_cooldown
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def host(self, host: str) -> HostState:
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = HostState(self.max_limit, self.burst)
+            return self._hosts[host]
+
+    def _acquire(self, host: str, state: HostState) -> bool:
+        """Wait for a concurrency slot and a token, returns whether the request is the probe of a half open circuit"""
+        with state.condition:
+            while True:
+                now = time.monotonic()
+                if state.opened_at is not None and (now - state.opened_at < self.breaker_cooldown or state.probing):
+                    metrics.inc("http_circuit_rejected_total", host=host)
+                    raise CircuitOpenError(f"Circuit open for {host} after {state.failures} consecutive failures")
+                if state.in_flight >= int(state.limit):
+                    state.condition.wait()
+                    continue
+                if self.rate > 0:
+                    state.tokens = min(self.burst, state.tokens + (now - state.refilled_at) * self.rate)
+                    state.refilled_at = now
+                    if state.tokens < 1:
+                        state.condition.wait((1 - state.tokens) / self.rate)
+                        continue
+                    state.tokens -= 1
+                # Half open: the request probes whether the host recovered, the others are rejected until it ends
+                probe = state.opened_at is not None
+                state.probing = state.probing or probe
+                state.in_flight += 1
+                return probe
+
+    def _release(self, host: str, state: HostState, succeeded: bool, slow: bool = False, probe: bool = False):
+        with state.condition:
+            state.in_flight -= 1
+            if probe:
+                state.probing = False
+            if succeeded:
+                state.failures = 0
+                state.opened_at = None
+            else:
+                state.failures += 1
+                if state.failures >= self.breaker_threshold:
+                    if state.opened_at is None:
+                        logger.warning(f"Circuit opened for {host} after {state.failures} consecutive failures")
+                        metrics.inc("http_circuit_opened_total", host=host)
+                    state.opened_at = time.monotonic()
+            if succeeded and not slow:
+                state.limit = min(self.max_limit, state.limit + 1 / state.limit)
+            else:
+                state.limit = max(1.0, state.limit / 2)
+            state.condition.notify_all()
+
+    def backoff(self, attempt: int, response: requests.Response = None) -> float:
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(HTTP_BACKOFF_MAX, float(retry_after))
+        return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2 ** attempt))
+
+    def send(self, request: requests.PreparedRequest, send) -> requests.Response:
+        """Send a request through send(), retrying throttled, failed and timed out attempts"""
+        host = urlsplit(request.url).netloc
+        state = self.host(host)
+        attempt = 0
+        while True:
+            probe = self._acquire(host, state)
+            response = None
+            try:
+                response = send()
+            except (requests.ConnectionError, requests.Timeout):
+                self._release(host, state, False, probe=probe)
+                if attempt >= self.max_retries:
+                    raise
+            except BaseException:
+                # Not retried, the slot and the probe are still given back
+                self._release(host, state, False, probe=probe)
+                raise
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    self._release(host, state, True, response.elapsed.total_seconds() > HTTP_SLOW_RESPONSE, probe)
+                    return response
+                self._release(host, state, False, probe=probe)
+                if attempt >= self.max_retries:
+                    return response
+                response.close()
+            delay = self.backoff(attempt, response)
+            metrics.inc("http_retries_total", host=host)
+            time.sleep(delay)
+            attempt += 1
+
+
+class ScheduledAdapter(BaseAdapter):
+    """Transport sending the requests of another transport through a scheduler, with a default timeout"""
+
+    def __init__(self, adapter: BaseAdapter, scheduler: RequestScheduler):
+        super().__init__()
+        self.adapter = adapter
+        self.scheduler = scheduler
+
+    def send(self, request, timeout=None, **kwargs):
+        if timeout is None:
+            timeout = HTTP_TIMEOUT
+        # Each attempt gets its own copy, as transports may rewrite the request
+        return self.scheduler.send(request, lambda: self.adapter.send(request.copy(), timeout=timeout, **kwargs))
+
+    def close(self):
+        self.adapter.close()
+
+
+# Shared by every session so that all the requests to a host are paced together
+scheduler = RequestScheduler()
+
+
+def new_session(pool_size: int = PER_HOST_LIMIT) -> requests.Session:
+    """Create a session keeping up to pool_size connections alive per host, its requests paced by the scheduler"""
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    # HTTP_RECORD, HTTP_REPLAY or HTTP_REPLAY_SERVER swap the transport, see replay.py
+    replay.mount(s, pool_size)
+    for prefix, mounted in list(s.adapters.items()):
+        # Replayed archives are served as fast as recorded, only network transports are paced
+        if isinstance(mounted, HTTPAdapter):
+            s.mount(prefix, ScheduledAdapter(mounted, scheduler))
+    s.hooks['response'].append(record_response)
+    return s
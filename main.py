@@ -1,6 +1,178 @@
-from export_pens import main as export_pens_main
-from export_design import main as export_design_main
-from track_staying_home import main as track_staying_home_main
-export_pens_main()
-export_design_main()
-track_staying_home_main()
\ No newline at end of file
+"""
+Run the pipeline, or some of its stages.
+
+    python main.py                          # every stage, same as python main.py all
+    python main.py pens                     # penalty pages only
+    python main.py designations             # designation export pages
+    python main.py staying-home             # staying-home report
+    python main.py workload                 # referee conflicts and workload report
+    python main.py all --skip pens          # --only and --skip take subcommand or stage names
+
+Each stage imports its modules when it runs, so a run only loads what its stages need.
+Startup stays within an import budget checked with python -X importtime:
+
+    python main.py import-budget            # fails above IMPORT_BUDGET_MS (default 100 ms)
+
+python main.py watch runs the penalty export as a daemon instead, see watch.py.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+import metrics
+from competitions import SEASON, season_file
+from pipeline import Stage, run_pipeline
+
+# Cumulative import time of main.py allowed by the import-budget command, in milliseconds
+IMPORT_BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", 100))
+
+# Export of the current season, see get_design.LOCAL_FILE_PATH (not imported as it loads requests)
+LOCAL_FILE_PATH = season_file(SEASON, "designations_export.csv")
+
+
+def run_pens():
+    from export_pens import main
+    main()
+
+
+def load_designations():
+    from designations import load
+    return load()
+
+
+def run_export_design():
+    from export_design import main
+    main(load_designations())
+
+
+def run_staying_home():
+    from track_staying_home import main
+    main(load_designations())
+
+
+def run_workload():
+    from track_workload import main
+    main(load_designations())
+
+
+# Modules shared by the designation stages whose changes can change their pages
+DESIGNATION_INPUTS = (LOCAL_FILE_PATH, "get_design.py", "designations.py", "render.py", "output.py")
+
+# The penalty scrape and the designation export are independent and run concurrently,
+# both designation stages share a single login, download and parse of the export
+STAGES = [
+    Stage("pens", run_pens,
+          outputs=("data/index.html",)),
+    Stage("designations", load_designations,
+          outputs=(LOCAL_FILE_PATH,)),
+    Stage("export_design", run_export_design,
+          inputs=DESIGNATION_INPUTS + ("export_design.py", "template_design.html", "shards.py", "template_virtual.html"),
+          outputs=("data/designations.html", "data/designations.csv"),
+          depends=("designations",),
+          env=("OUTPUT_MODE",)),
+    Stage("staying_home", run_staying_home,
+          inputs=DESIGNATION_INPUTS + ("track_staying_home.py", "referee_index.py", "template_staying_home.html"),
+          outputs=("data/staying_home.html",),
+          depends=("designations",)),
+    Stage("workload", run_workload,
+          inputs=DESIGNATION_INPUTS + ("track_workload.py", "referee_timeline.py", "template_staying_home.html"),
+          outputs=("data/workload.html",),
+          depends=("designations",)),
+]
+
+# Stages run by each subcommand
+COMMANDS = {
+    "pens": ("pens",),
+    "designations": ("designations", "export_design"),
+    "staying-home": ("designations", "staying_home"),
+    "workload": ("designations", "workload"),
+    "all": tuple(stage.name for stage in STAGES),
+}
+
+
+def stage_names(name: str) -> tuple:
+    """Stages run by a subcommand, or the stage of that name"""
+    return COMMANDS.get(name, (name.replace("-", "_"),))
+
+
+def dependents(names) -> set:
+    """Stages named in names and every stage depending on them, directly or not"""
+    names = set(names)
+    # STAGES lists a stage after its dependencies
+    for stage in STAGES:
+        if any(dependency in names for dependency in stage.depends):
+            names.add(stage.name)
+    return names
+
+
+def select_stages(names, only=None, skip=None) -> list:
+    """
+    Stages named in names, restricted to the stages of the subcommands or stages in only, without
+    the stages in skip and those depending on them. Dependencies on stages left out are dropped:
+    every stage loads what it needs by itself.
+    """
+    known = {stage.name for stage in STAGES}
+    unknown = {name for name in (only or ()) if not set(stage_names(name)) <= known}
+    unknown |= {name for name in (skip or ()) if name.replace("-", "_") not in known}
+    if unknown:
+        raise ValueError(f"Unknown stages {', '.join(sorted(unknown))}")
+    kept = {stage for name in only for stage in stage_names(name)} if only else set(names)
+    skipped = dependents(name.replace("-", "_") for name in skip or ())
+    selected = [name for name in names if name in kept and name not in skipped]
+    return [stage._replace(depends=tuple(dependency for dependency in stage.depends if dependency in selected))
+            for stage in STAGES if stage.name in selected]
+
+
+def import_time(module: str = "main") -> float:
+    """Cumulative import time of a module in a fresh interpreter, in milliseconds"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    # import time: self [us] | cumulative | imported package, nested imports are indented
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\S+)$", line)
+        if match and match.group(2) == module:
+            return int(match.group(1)) / 1000
+    raise RuntimeError(f"No import time reported for {module}")
+
+
+def check_import_budget(budget_ms: float = IMPORT_BUDGET_MS) -> bool:
+    elapsed = import_time()
+    print(f"main.py imports in {elapsed:.1f} ms, budget {budget_ms:.0f} ms")
+    return elapsed <= budget_ms
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command")
+    # Subcommands and stages, skipping designations also skips the stages reading them
+    names = sorted((set(COMMANDS) - {"all"}) | {stage.name for stage in STAGES} - {command.replace("-", "_") for command in COMMANDS})
+    for command in COMMANDS:
+        command_parser = commands.add_parser(command, help=f"Run the {', '.join(COMMANDS[command])} stages")
+        command_parser.add_argument("--only", action="append", choices=names, metavar="STAGE",
+                                    help=f"Run only the stages of this subcommand or this stage, can be repeated: {', '.join(names)}")
+        command_parser.add_argument("--skip", action="append", choices=names, metavar="STAGE",
+                                    help="Do not run this stage nor the stages depending on it, can be repeated")
+    commands.add_parser("watch", help="Ingest games as soon as they finish, until stopped")
+    budget_parser = commands.add_parser("import-budget", help="Check the import time of main.py with python -X importtime")
+    budget_parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    args = parser.parse_args(argv)
+
+    if args.command == "import-budget":
+        return 0 if check_import_budget(args.budget_ms) else 1
+
+    metrics.configure_logging()
+    if args.command == "watch":
+        from watch import main as watch_main
+        watch_main()
+        return 0
+    command = args.command or "all"
+    stages = select_stages(COMMANDS[command], getattr(args, 'only', None), getattr(args, 'skip', None))
+    succeeded = run_pipeline(stages)
+    metrics.write()
+    return 0 if succeeded else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
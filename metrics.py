@@ -0,0 +1,146 @@
+"""
+Counters, histograms and spans of a pipeline run, exported as a JSON run summary and
+a Prometheus textfile (for the node_exporter textfile collector).
+
+LOG_LEVEL sets the verbosity (DEBUG, INFO, WARNING...), HTTP_DEBUG=1 also logs urllib3 traffic.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+PREFIX = "hockeypenstats_"
+SUMMARY_PATH = os.environ.get("METRICS_SUMMARY_PATH", "data/metrics.json")
+PROMETHEUS_PATH = os.environ.get("METRICS_PROMETHEUS_PATH", "data/metrics.prom")
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+# Finished spans kept for the run summary, the histograms keep counting beyond it
+MAX_SPANS = 10000
+
+_lock = threading.Lock()
+_local = threading.local()
+_counters = defaultdict(float)  # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [bucket counts, sum, count]
+_spans = []
+_started_at = time.time()
+
+
+def configure_logging():
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if os.environ.get("HTTP_DEBUG"):
+        logging.getLogger("urllib3").setLevel(logging.DEBUG)
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def inc(name: str, value: float = 1, **labels):
+    with _lock:
+        _counters[_key(name, labels)] += value
+
+
+def observe(name: str, value: float, **labels):
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [[0] * len(BUCKETS), 0.0, 0]
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                histogram[0][i] += 1
+        histogram[1] += value
+        histogram[2] += 1
+
+
+@contextmanager
+def span(name: str, **labels):
+    """Time a block: observed in the <name>_seconds histogram and recorded as a span"""
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    parent = stack[-1] if stack else None
+    stack.append(name)
+    start = time.time()
+    start_wall = time.perf_counter()
+    start_cpu = time.thread_time()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = repr(e)
+        raise
+    finally:
+        stack.pop()
+        duration = time.perf_counter() - start_wall
+        observe(f"{name}_seconds", duration, **labels)
+        with _lock:
+            if len(_spans) < MAX_SPANS:
+                _spans.append({
+                    'name': name,
+                    'labels': labels,
+                    'parent': parent,
+                    'thread': threading.current_thread().name,
+                    'start': start,
+                    'duration': duration,
+                    'cpu': time.thread_time() - start_cpu,
+                    'error': error,
+                })
+
+
+def summary() -> dict:
+    with _lock:
+        return {
+            'started_at': _started_at,
+            'duration': time.time() - _started_at,
+            'counters': [{'name': name, 'labels': dict(labels), 'value': value} for (name, labels), value in sorted(_counters.items())],
+            'histograms': [{'name': name, 'labels': dict(labels), 'count': count, 'sum': total,
+                            'buckets': dict(zip(BUCKETS, buckets))} for (name, labels), (buckets, total, count) in sorted(_histograms.items())],
+            'spans': list(_spans),
+        }
+
+
+def _labels(labels: tuple, extra: dict = None) -> str:
+    pairs = list(labels) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    escaped = [(key, str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")) for key, value in pairs]
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def prometheus() -> str:
+    lines = []
+    with _lock:
+        typed = set()
+        for (name, labels), value in sorted(_counters.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {PREFIX}{name} counter")
+                typed.add(name)
+            lines.append(f"{PREFIX}{name}{_labels(labels)} {value}")
+        for (name, labels), (buckets, total, count) in sorted(_histograms.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                typed.add(name)
+            for bound, bucket_count in zip(BUCKETS, buckets):
+                lines.append(f"{PREFIX}{name}_bucket{_labels(labels, {'le': bound})} {bucket_count}")
+            lines.append(f"{PREFIX}{name}_bucket{_labels(labels, {'le': '+Inf'})} {count}")
+            lines.append(f"{PREFIX}{name}_sum{_labels(labels)} {total}")
+            lines.append(f"{PREFIX}{name}_count{_labels(labels)} {count}")
+    lines.append(f"# TYPE {PREFIX}last_run_timestamp_seconds gauge")
+    lines.append(f"{PREFIX}last_run_timestamp_seconds {time.time()}")
+    return "\n".join(lines) + "\n"
+
+
+def _write(path: str, content: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Renamed into place so a collector never reads a partial file
+    with open(path + ".tmp", 'w') as f:
+        f.write(content)
+    os.replace(path + ".tmp", path)
+
+
+def write(summary_path: str = SUMMARY_PATH, prometheus_path: str = PROMETHEUS_PATH):
+    _write(summary_path, json.dumps(summary(), indent=4))
+    _write(prometheus_path, prometheus())
@@ -0,0 +1,91 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MANIFEST_PATH = "data/manifest.json"
+
+_manifest_lock = threading.Lock()
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_manifest() -> dict:
+    if os.path.exists(MANIFEST_PATH):
+        with open(MANIFEST_PATH, 'r') as f:
+            return json.load(f)
+    return {}
+
+
+def _write_atomic(path: str, content: bytes):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".", suffix=".tmp")
+    with os.fdopen(fd, 'wb') as f:
+        f.write(content)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+
+
+def _write_compressed(path: str):
+    """Precompressed siblings served as is by the web server"""
+    with open(path, 'rb') as f:
+        content = f.read()
+    _write_atomic(path + ".gz", gzip.compress(content, compresslevel=9, mtime=0))
+    if brotli is not None:
+        _write_atomic(path + ".br", brotli.compress(content))
+
+
+def _commit(path: str, tmp_path: str) -> bool:
+    """Move tmp_path over path unless both have the same content, returns whether path changed"""
+    new_hash = _hash_file(tmp_path)
+    with _manifest_lock:
+        manifest = _read_manifest()
+        previous = manifest.get(path, {}).get('sha256')
+        if previous is None and os.path.exists(path):
+            previous = _hash_file(path)
+        if previous == new_hash and os.path.exists(path):
+            os.remove(tmp_path)
+            if not os.path.exists(path + ".gz"):
+                _write_compressed(path)
+            changed = False
+        else:
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+            _write_compressed(path)
+            changed = True
+        if changed or path not in manifest:
+            manifest[path] = {'sha256': new_hash, 'size': os.path.getsize(path), 'updated_at': time.time()}
+            _write_atomic(MANIFEST_PATH, json.dumps(manifest, indent=4, sort_keys=True).encode())
+    return changed
+
+
+@contextmanager
+def open_output(path: str, newline: str = None):
+    """
+    Text file to publish: written to a temporary file then renamed over path, with .gz
+    (and .br when brotli is installed) siblings and an entry in data/manifest.json.
+    When the content did not change, path and its siblings are left untouched.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', newline=newline) as f:
+            yield f
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    _commit(path, tmp_path)
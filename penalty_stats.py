@@ -0,0 +1,182 @@
+import json
+import os
+from collections import defaultdict
+
+from competitions import SEASON, season_file
+from penalty_store import Penalty, PenaltyStore
+from render import join_chunks, table_rows
+
+AGGREGATES_PATH = season_file(SEASON, "penalty_aggregates.json")
+PERIOD_SECONDS = 20 * 60
+REGULATION_PERIODS = 3
+
+TABLE = """    <h2>{title}</h2>
+    <table>
+        <thead>
+            <tr>{header}</tr>
+        </thead>
+        <tbody>
+"""
+TABLE_END = """
+        </tbody>
+    </table>
+"""
+
+
+def penalty_minutes(penalty: Penalty) -> int:
+    """Minutes of a duration like '2:00'"""
+    minutes, _, seconds = penalty.duration.partition(':')
+    try:
+        return int(minutes) + int(seconds or 0) // 60
+    except ValueError:
+        return 0
+
+
+def penalty_period(penalty: Penalty) -> str:
+    """'1', '2' or '3' for regulation periods, 'Prol.' for overtime, from the HH:MM:SS game time"""
+    try:
+        hours, minutes, seconds = (int(part) for part in penalty.time.split(':'))
+    except ValueError:
+        return "?"
+    period = (hours * 3600 + minutes * 60 + seconds) // PERIOD_SECONDS + 1
+    return str(period) if period <= REGULATION_PERIODS else "Prol."
+
+
+def penalty_side(penalty: Penalty) -> str:
+    if penalty.team == penalty.home:
+        return "home"
+    if penalty.team == penalty.away:
+        return "away"
+    return "unknown"
+
+
+def _counter() -> list:
+    return [0, 0]  # penalty count, penalty minutes
+
+
+class CompetitionAggregates:
+    """Penalty counts and minutes of one competition, by team, player, code, period and side, and per game"""
+
+    def __init__(self, data: dict = None):
+        data = data or {}
+        self.team = defaultdict(_counter, data.get('team', {}))
+        self.player = defaultdict(_counter, {tuple(key.split("\t", 1)): value for key, value in data.get('player', {}).items()})
+        self.code = defaultdict(_counter, data.get('code', {}))
+        self.period = defaultdict(_counter, data.get('period', {}))
+        self.side = defaultdict(_counter, data.get('side', {}))
+        # game id -> [date, home, away, home count, home minutes, away count, away minutes]
+        self.games = {int(game_id): game for game_id, game in data.get('games', {}).items()}
+
+    def add_game(self, game_id: int, penalties: list):
+        game = None
+        for penalty in penalties:
+            minutes = penalty_minutes(penalty)
+            side = penalty_side(penalty)
+            for counter in (self.team[penalty.team], self.code[penalty.code],
+                            self.period[penalty_period(penalty)], self.side[side]):
+                counter[0] += 1
+                counter[1] += minutes
+            if penalty.player:
+                counter = self.player[(penalty.team, penalty.player)]
+                counter[0] += 1
+                counter[1] += minutes
+            if game is None:
+                game = [penalty.date, penalty.home, penalty.away, 0, 0, 0, 0]
+            if side == "home":
+                game[3] += 1
+                game[4] += minutes
+            elif side == "away":
+                game[5] += 1
+                game[6] += minutes
+        if game is not None:
+            self.games[int(game_id)] = game
+
+    def to_dict(self) -> dict:
+        return {
+            'team': dict(self.team),
+            'player': {"\t".join(key): value for key, value in self.player.items()},
+            'code': dict(self.code),
+            'period': dict(self.period),
+            'side': dict(self.side),
+            'games': {str(game_id): game for game_id, game in self.games.items()},
+        }
+
+
+class PenaltyAggregates:
+    """
+    Penalty aggregates of every competition, persisted with the ids of the games they include
+    so that each run only adds the games stored since the previous one
+    """
+
+    def __init__(self, path: str = AGGREGATES_PATH):
+        self.path = path
+        self.applied = set()
+        self.competitions = defaultdict(CompetitionAggregates)
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                data = json.load(f)
+            self.applied = set(data['applied'])
+            for competition, aggregates in data['competitions'].items():
+                self.competitions[competition] = CompetitionAggregates(aggregates)
+
+    def apply(self, game_id: int, competition: str, penalties: list) -> bool:
+        """Add the penalties of a game, unless it was already included"""
+        game_id = int(game_id)
+        if game_id in self.applied:
+            return False
+        self.competitions[competition].add_game(game_id, penalties)
+        self.applied.add(game_id)
+        return True
+
+    def sync(self, store: PenaltyStore) -> int:
+        """Add the games of the store missing from the aggregates, rebuilt if they include unknown games"""
+        if not self.applied <= store.games.keys():
+            self.applied = set()
+            self.competitions.clear()
+        applied = 0
+        for competition, game_ids in store.competitions.items():
+            for game_id in game_ids:
+                applied += self.apply(game_id, competition, store.by_game(game_id))
+        return applied
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        data = {
+            'applied': sorted(self.applied),
+            'competitions': {competition: aggregates.to_dict() for competition, aggregates in sorted(self.competitions.items())},
+        }
+        with open(self.path + ".tmp", 'w') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(self.path + ".tmp", self.path)
+
+
+def _table(title: str, header: list, rows):
+    yield TABLE.format(title=title, header="".join(f"<th scope=\"col\">{cell}</th>" for cell in header))
+    yield from join_chunks(table_rows(rows))
+    yield TABLE_END
+
+
+def _ranked(counters: dict) -> list:
+    # Most penalized first, then by name for a stable order
+    return sorted(counters.items(), key=lambda item: (-item[1][1], -item[1][0], item[0]))
+
+
+def stats_sections(name: str, aggregates: CompetitionAggregates):
+    """Tables of a competition's penalty aggregates"""
+    yield f"    <h1>Pénalités {name}</h1>\n"
+    yield from _table("Équipes", ["Équipe", "Pénalités", "Minutes"],
+                      [[team, count, minutes] for team, (count, minutes) in _ranked(aggregates.team)])
+    yield from _table("Joueurs", ["Joueur", "Équipe", "Pénalités", "Minutes"],
+                      [[player, team, count, minutes] for (team, player), (count, minutes) in _ranked(aggregates.player)])
+    yield from _table("Sanctions", ["Code", "Pénalités", "Minutes"],
+                      [[code, count, minutes] for code, (count, minutes) in _ranked(aggregates.code)])
+    yield from _table("Périodes", ["Période", "Pénalités", "Minutes"],
+                      [[period, *aggregates.period[period]] for period in sorted(aggregates.period)])
+    sides = {"home": "Domicile", "away": "Extérieur", "unknown": "Inconnu"}
+    yield from _table("Domicile / Extérieur", ["Côté", "Pénalités", "Minutes"],
+                      [[label, *aggregates.side[side]] for side, label in sides.items() if side in aggregates.side])
+    # Dates are DD/MM/YYYY, most recent game first
+    games = sorted(aggregates.games.values(), key=lambda game: game[0].split("/")[::-1], reverse=True)
+    yield from _table("Différentiel par match", ["Date", "Domicile", "Extérieur", "Pén. dom.", "Min. dom.", "Pén. ext.", "Min. ext.", "Différentiel (min.)"],
+                      [[date, home, away, home_count, home_minutes, away_count, away_minutes, f"{home_minutes - away_minutes:+d}"]
+                       for date, home, away, home_count, home_minutes, away_count, away_minutes in games])
@@ -0,0 +1,116 @@
+import json
+import os
+from collections import defaultdict
+from typing import NamedTuple
+
+from competitions import SEASON, season_file
+
+STORE_PATH = season_file(SEASON, "penalties.jsonl")
+LEGACY_PATH = "data/finished_games.json"
+
+
+class Penalty(NamedTuple):
+    game_id: int
+    competition: str
+    date: str
+    home: str
+    away: str
+    time: str
+    team: str
+    player: str
+    served_by: str
+    duration: str
+    code: str
+
+    def to_row(self) -> list:
+        """Cells in the order of the exported penalty tables"""
+        return list(self[2:])
+
+
+class PenaltyStore:
+    """
+    Append-only penalty store, one JSON line per finished game:
+    {"game_id": 1234, "competition": "magnus", "penalties": [[date, home, away, ...], ...]}
+    Games without penalties are stored too so they are not fetched again.
+    """
+
+    def __init__(self, path: str = STORE_PATH):
+        self.path = path
+        self.games = {}  # game id -> list of Penalty, in insertion order
+        self.competitions = defaultdict(list)  # competition -> game ids
+        self._indexes = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                for line in f:
+                    if line.strip():
+                        self._load(json.loads(line))
+
+    def _load(self, record: dict):
+        game_id = int(record['game_id'])
+        competition = record['competition']
+        if game_id not in self.games:
+            self.competitions[competition].append(game_id)
+        self.games[game_id] = [Penalty(game_id, competition, *row) for row in record['penalties']]
+        self._indexes.clear()
+
+    def __contains__(self, game_id) -> bool:
+        return int(game_id) in self.games
+
+    def __len__(self) -> int:
+        return len(self.games)
+
+    def append(self, game_id: int, competition: str, rows: list):
+        """Store the penalty rows of a game by appending a single line to the store"""
+        record = {"game_id": int(game_id), "competition": competition, "penalties": [[str(cell) for cell in row] for row in rows]}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._load(record)
+
+    def import_legacy(self, competition_games: dict, path: str = LEGACY_PATH) -> int:
+        """
+        Import games from the former finished_games.json (game id -> TSV dump)
+        competition_games maps each competition to its game ids, as the legacy file is not tagged.
+        The file is then renamed to finished_games.json.imported so that it is only read once,
+        its games missing from competition_games are fetched again like any other game.
+        """
+        if not os.path.exists(path):
+            return 0
+        with open(path, 'r') as f:
+            legacy = json.load(f)
+        imported = 0
+        for competition, game_ids in competition_games.items():
+            for game_id in game_ids:
+                dump = legacy.get(str(game_id))
+                if dump is None or game_id in self:
+                    continue
+                rows = [line.split("\t") for line in dump.split("\n") if line]
+                self.append(game_id, competition, rows)
+                imported += 1
+        os.replace(path, path + ".imported")
+        return imported
+
+    def _index(self, field: str) -> dict:
+        # Secondary indexes are built on first lookup and dropped whenever a game is added
+        if field not in self._indexes:
+            index = defaultdict(list)
+            for penalties in self.games.values():
+                for penalty in penalties:
+                    index[getattr(penalty, field)].append(penalty)
+            self._indexes[field] = index
+        return self._indexes[field]
+
+    def by_game(self, game_id: int) -> list:
+        return self.games.get(int(game_id), [])
+
+    def by_competition(self, competition: str) -> list:
+        return [penalty for game_id in self.competitions.get(competition, []) for penalty in self.games[game_id]]
+
+    def by_team(self, team: str) -> list:
+        return self._index('team').get(team, [])
+
+    def by_player(self, player: str) -> list:
+        return self._index('player').get(player, [])
+
+    def by_code(self, code: str) -> list:
+        return self._index('code').get(code, [])
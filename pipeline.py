@@ -0,0 +1,141 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, NamedTuple
+
+import metrics
+
+STATE_PATH = "data/pipeline_state.json"
+
+logger = logging.getLogger(__name__)
+
+
+class Stage(NamedTuple):
+    name: str
+    run: Callable[[], object]
+    inputs: tuple = ()  # files whose content decides whether the stage must run again
+    outputs: tuple = ()  # files the stage writes, it runs again if one is missing
+    depends: tuple = ()  # stages that must succeed before this one starts
+    env: tuple = ()  # environment variables whose value decides whether the stage must run again, like inputs
+
+
+def input_hashes(stage: Stage) -> dict:
+    """Hash of each input file and value of each environment variable of a stage"""
+    hashes = {path: file_hash(path) for path in stage.inputs}
+    hashes.update({f"${name}": os.environ.get(name) for name in stage.env})
+    return hashes
+
+
+def file_hash(path: str) -> str | None:
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_state(path: str = STATE_PATH) -> dict:
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+    return {}
+
+
+def write_state(state: dict, path: str = STATE_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(state, f, indent=4)
+
+
+def is_up_to_date(stage: Stage, hashes: dict, previous: dict) -> bool:
+    """A stage without inputs always runs, as it depends on remote data"""
+    if not stage.inputs or previous.get('inputs') != hashes:
+        return False
+    return all(os.path.exists(output) for output in stage.outputs)
+
+
+def _timed(stage: Stage) -> tuple:
+    """
+    Wall time, process CPU time and stage thread CPU time of a stage. The process CPU time includes
+    the worker threads of the stage (the pens stage parses games in a thread pool), it is only the
+    stage's own when no other stage ran at the same time, see run_pipeline.
+    """
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+    start_thread_cpu = time.thread_time()
+    with metrics.span("stage", stage=stage.name):
+        stage.run()
+    return time.perf_counter() - start_wall, time.process_time() - start_cpu, time.thread_time() - start_thread_cpu
+
+
+def run_pipeline(stages: list, max_workers: int = 4, state_path: str = STATE_PATH) -> bool:
+    """
+    Run the stages as soon as their dependencies succeeded, independent stages concurrently.
+    Stages whose input files did not change since their last successful run are skipped.
+    Returns whether every stage succeeded or was up to date.
+
+    The CPU time of a stage is the process CPU time while it ran, recorded only when it ran alone
+    (None otherwise, as it would include the other stages). thread_cpu_time is always recorded but
+    leaves out the stage's worker threads. The process CPU time of the whole run is logged at the end.
+    """
+    state = read_state(state_path)
+    pending = {stage.name: stage for stage in stages}
+    done = set()
+    failed = set()
+    overlapped = set()  # stages that ran at the same time as another one
+    report = []
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if any(dependency in failed for dependency in stage.depends):
+                    del pending[name]
+                    failed.add(name)
+                    report.append((name, "not run", 0, 0))
+                    continue
+                if not all(dependency in done for dependency in stage.depends):
+                    continue
+                del pending[name]
+                hashes = input_hashes(stage)
+                if is_up_to_date(stage, hashes, state.get(name, {})):
+                    done.add(name)
+                    report.append((name, "up to date", 0, 0))
+                    continue
+                if running:
+                    overlapped.update([stage.name] + [other.name for other, _ in running.values()])
+                running[executor.submit(_timed, stage)] = (stage, hashes)
+            if not running:
+                if pending:
+                    raise ValueError(f"Unknown or circular dependencies in stages {', '.join(pending)}")
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, hashes = running.pop(future)
+                try:
+                    wall, cpu, thread_cpu = future.result()
+                except Exception as e:
+                    logger.exception(f"Stage {stage.name} failed", exc_info=e)
+                    failed.add(stage.name)
+                    report.append((stage.name, "failed", 0, 0))
+                    continue
+                done.add(stage.name)
+                if stage.name in overlapped:
+                    cpu = None
+                state[stage.name] = {'inputs': hashes, 'wall_time': wall, 'cpu_time': cpu, 'thread_cpu_time': thread_cpu,
+                                     'finished_at': time.time()}
+                write_state(state, state_path)
+                report.append((stage.name, "done", wall, cpu))
+
+    for name, status, wall, cpu in report:
+        cpu = "concurrent" if cpu is None else f"{cpu:8.2f} s"
+        logger.info(f"Stage {name:<20}{status:<14}wall {wall:8.2f} s  process cpu {cpu:>10}")
+        metrics.inc("stage_runs_total", stage=name, status=status)
+    logger.info(f"Pipeline {'':<32}wall {time.perf_counter() - start_wall:8.2f} s  process cpu {time.process_time() - start_cpu:8.2f} s")
+    return not failed
@@ -0,0 +1,78 @@
+from collections import defaultdict
+from datetime import datetime
+from designations import Designations, SUPERVISOR_COLUMN
+
+
+def bit_ids(bitset: int):
+    """Ids of the bits set in bitset, in increasing order"""
+    while bitset:
+        low = bitset & -bitset
+        yield low.bit_length() - 1
+        bitset ^= low
+
+
+class RefereeIndex:
+    """
+    Referee assignments built in one pass over the parsed designations.
+    Referees and competitions are interned to integer ids and the referees assigned
+    on a date and competition are stored as a bitset (bit n set for referee id n),
+    so availability questions become a few integer and/or/not operations per day.
+    """
+
+    def __init__(self, designations: Designations, max_column: int = SUPERVISOR_COLUMN):
+        # Referee and competition ids are the ones interned by the designation parser
+        self.referees = designations.referees  # id -> (last name, first name)
+        self.referee_ids = designations.referee_ids
+        self.competitions = designations.strings  # id -> competition name
+        self.competition_ids = {designations.strings[competition]: competition for competition in set(designations.competition)}
+        self.assignments = defaultdict(lambda: defaultdict(int))  # date -> competition id -> referees bitset
+        self.game_counts = defaultdict(lambda: defaultdict(int))  # date -> competition id -> games
+        self.referee_games = defaultdict(lambda: defaultdict(int))  # competition id -> referee id -> games
+        for i in range(len(designations)):
+            competition = designations.competition[i]
+            date = designations.strings[designations.date[i]]
+            self.game_counts[date][competition] += 1
+            bitset = 0
+            for _, referee in designations.game_referees(i, max_column):
+                self.referee_games[competition][referee] += 1
+                bitset |= 1 << referee
+            self.assignments[date][competition] |= bitset
+        self.dates = sorted(self.assignments, key=lambda date: datetime.strptime(date, "%d/%m/%Y"))
+
+    def competition_id(self, competition: str) -> int:
+        return self.competition_ids.get(competition, -1)
+
+    def qualified(self, competition: str, min_games: int) -> int:
+        """Referees with at least min_games games in competition"""
+        counts = self.referee_games.get(self.competition_id(competition), {})
+        bitset = 0
+        for referee, count in counts.items():
+            if count >= min_games:
+                bitset |= 1 << referee
+        return bitset
+
+    def games_on(self, date: str, competition: str) -> int:
+        return self.game_counts[date].get(self.competition_id(competition), 0)
+
+    def assigned(self, date: str, competition: str) -> int:
+        """Referees assigned to competition games on date"""
+        return self.assignments[date].get(self.competition_id(competition), 0)
+
+    def assigned_elsewhere(self, date: str, competition: str) -> int:
+        """Referees assigned to games of any other competition on date"""
+        excluded = self.competition_id(competition)
+        bitset = 0
+        for competition_id, referees in self.assignments[date].items():
+            if competition_id != excluded:
+                bitset |= referees
+        return bitset
+
+    def competitions_of(self, date: str, referee, excluded: str = None) -> list:
+        """Names of the competitions referee is assigned to on date"""
+        bit = 1 << self.referee_ids[referee]
+        excluded_id = self.competition_id(excluded) if excluded else -1
+        return [self.competitions[competition_id] for competition_id, referees in self.assignments[date].items()
+                if competition_id != excluded_id and referees & bit]
+
+    def referees_of(self, bitset: int) -> list:
+        return [self.referees[referee] for referee in bit_ids(bitset)]
@@ -0,0 +1,128 @@
+import os
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import metrics
+from designations import Designations, SUPERVISOR_COLUMN
+
+# Expected length of a game, from its start time to the referees being free again, in minutes
+GAME_MINUTES = int(os.environ.get("TIMELINE_GAME_MINUTES", 150))
+EPOCH = datetime(1970, 1, 1)
+TIME_FORMATS = ("%d/%m/%Y %H:%M", "%d/%m/%Y %Hh%M")
+
+
+@lru_cache(maxsize=None)
+def game_start(date: str, time: str) -> int | None:
+    """Start of a game in minutes since 1970 (local time), None without a valid date and time"""
+    for time_format in TIME_FORMATS:
+        try:
+            return (datetime.strptime(f"{date} {time}", time_format) - EPOCH) // timedelta(minutes=1)
+        except ValueError:
+            continue
+    return None
+
+
+def start_datetime(start: int) -> datetime:
+    return EPOCH + timedelta(minutes=start)
+
+
+class RefereeTimeline:
+    """
+    Games of every referee sorted by start time, across all competitions. Each referee has
+    two parallel arrays, the game starts in minutes and the game indexes in the designations,
+    so interval questions (games in a window, previous and next game, overlaps) are a couple
+    of bisections in the referee's starts. Every game is considered to last GAME_MINUTES.
+    """
+
+    def __init__(self, designations: Designations, max_column: int = SUPERVISOR_COLUMN, game_minutes: int = GAME_MINUTES):
+        self.designations = designations
+        self.game_minutes = game_minutes
+        self.referees = designations.referees  # id -> (last name, first name)
+        self.referee_ids = designations.referee_ids
+        self.starts = {}  # referee id -> game starts, increasing
+        self.games = {}  # referee id -> game indexes, in the order of starts
+        self.untimed = []  # games without a date and time that could be parsed
+        strings = designations.strings
+        with metrics.span("referee_timeline"):
+            timelines = defaultdict(list)
+            for i in range(len(designations)):
+                start = game_start(strings[designations.date[i]], strings[designations.time[i]])
+                if start is None:
+                    self.untimed.append(i)
+                    continue
+                # A referee listed in two roles of a game is only counted once
+                for referee in {referee for _, referee in designations.game_referees(i, max_column)}:
+                    timelines[referee].append((start, i))
+            for referee, timeline in timelines.items():
+                timeline.sort()
+                self.starts[referee] = array('I', [start for start, _ in timeline])
+                self.games[referee] = array('I', [game for _, game in timeline])
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def referee_id(self, referee) -> int:
+        """Id of a referee given as an id or as (last name, first name)"""
+        return referee if isinstance(referee, int) else self.referee_ids.get(referee, -1)
+
+    def count_between(self, referee, start: int, end: int) -> int:
+        """Games of referee starting in [start, end)"""
+        starts = self.starts.get(self.referee_id(referee), ())
+        return bisect_left(starts, end) - bisect_left(starts, start)
+
+    def games_between(self, referee, start: int, end: int) -> list:
+        """Indexes of the games of referee starting in [start, end), in start order"""
+        referee = self.referee_id(referee)
+        starts = self.starts.get(referee, ())
+        return list(self.games[referee][bisect_left(starts, start):bisect_left(starts, end)]) if starts else []
+
+    def overlapping(self, referee, start: int, end: int) -> list:
+        """Indexes of the games of referee being played at some point of [start, end)"""
+        return self.games_between(referee, start - self.game_minutes + 1, end)
+
+    def previous_game(self, referee, start: int) -> int | None:
+        """Index of the last game of referee starting before start"""
+        referee = self.referee_id(referee)
+        position = bisect_left(self.starts.get(referee, ()), start)
+        return self.games[referee][position - 1] if position else None
+
+    def next_game(self, referee, start: int) -> int | None:
+        """Index of the first game of referee starting after start"""
+        referee = self.referee_id(referee)
+        starts = self.starts.get(referee, ())
+        position = bisect_right(starts, start)
+        return self.games[referee][position] if position < len(starts) else None
+
+    def start(self, game: int) -> int:
+        strings = self.designations.strings
+        return game_start(strings[self.designations.date[game]], strings[self.designations.time[game]])
+
+    def rest_before(self, referee, game: int) -> int | None:
+        """Minutes between the end of the previous game of referee and the start of game, negative when they overlap"""
+        start = self.start(game)
+        previous = self.previous_game(referee, start)
+        if previous is None:
+            return None
+        return start - self.start(previous) - self.game_minutes
+
+    def transitions(self, referee):
+        """(previous game, game, rest in minutes) for each pair of consecutive games of referee"""
+        referee = self.referee_id(referee)
+        starts = self.starts.get(referee, ())
+        games = self.games.get(referee, ())
+        for position in range(1, len(starts)):
+            yield games[position - 1], games[position], starts[position] - starts[position - 1] - self.game_minutes
+
+    def max_rolling_count(self, referee, window: int) -> tuple:
+        """(games, first game) of the window of window minutes holding the most games of referee"""
+        referee = self.referee_id(referee)
+        starts = self.starts.get(referee, ())
+        best = (0, None)
+        for position, start in enumerate(starts):
+            count = bisect_left(starts, start + window, position) - position
+            if count > best[0]:
+                best = (count, self.games[referee][position])
+        return best
@@ -0,0 +1,49 @@
+import json
+import os
+
+import metrics
+from output import open_output
+
+# "html" inlines every row in the pages, "sharded" writes them as monthly JSON shards
+# loaded on demand by a virtualized table, see shards.py
+OUTPUT_MODE = os.environ.get("OUTPUT_MODE", "html")
+
+
+def join_chunks(chunks, separator: str = "\n"):
+    """Same output as separator.join(chunks), without building the joined string"""
+    first = True
+    for chunk in chunks:
+        if not first:
+            yield separator
+        first = False
+        yield chunk
+
+
+def table_rows(rows):
+    """<tr><td>...</td></tr> line of each row"""
+    for row in rows:
+        yield "<tr>" + "".join([f"<td>{cell}</td>" for cell in row]) + "</tr>"
+
+
+def render_template(template_path: str, output_path: str, chunks, placeholder: str = "%DATA%", values: dict = None):
+    """
+    Write the template to output_path with placeholder replaced by the chunks, which are
+    written as they are produced so the whole page is never held in memory.
+    values replaces other placeholders of the template, like {"%TITLE%": "..."}.
+    """
+    with open(template_path, 'r') as f:
+        template = f.read()
+    for name, value in (values or {}).items():
+        template = template.replace(name, value)
+    head, tail = template.split(placeholder, 1)
+    with metrics.span("render", output=output_path), open_output(output_path) as f:
+        f.write(head)
+        for chunk in chunks:
+            f.write(chunk)
+        f.write(tail)
+
+
+def render_virtual_page(output_path: str, title: str, source: str):
+    """Page showing the rows of the shards listed in source (relative to the page) in a virtualized table"""
+    config = json.dumps({'title': title, 'source': source}, ensure_ascii=False)
+    render_template("template_virtual.html", output_path, [config], placeholder="%CONFIG%")
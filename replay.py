@@ -0,0 +1,242 @@
+"""
+Record and replay of the HTTP traffic of the pipeline, for offline and deterministic runs.
+
+    HTTP_RECORD=data/traffic.jsonl.gz python main.py      # record every request/response
+    HTTP_REPLAY=data/traffic.jsonl.gz python main.py      # serve them back without network
+
+Record with an empty HTTP cache (HTTP_CACHE_PATH pointing to a new directory) so that
+full responses are captured rather than 304 revalidations.
+HTTP_REPLAY_LATENCY (seconds) and HTTP_REPLAY_CONCURRENCY simulate a slow or throttled site.
+The same archive can be served by a local stand-in server:
+
+    python replay.py serve data/traffic.jsonl.gz --port 8765 --latency 0.2 --concurrency 4
+    HTTP_REPLAY_SERVER=http://127.0.0.1:8765 python main.py
+"""
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+# Never written to an archive nor part of the request keys
+REDACTED_FIELDS = {'username', 'password', '_token'}
+# Request fields computed from the current date (the designation sync window): only whether
+# they are set is part of the request keys, so that an archive replays on another day
+DATED_FIELDS = {'dates'}
+DROPPED_HEADERS = {'set-cookie', 'content-encoding', 'transfer-encoding', 'content-length', 'connection'}
+
+
+def _normalize_body(body) -> str:
+    """Request body with credentials removed and keys sorted, so equal requests match"""
+    if body is None:
+        return ""
+    if isinstance(body, bytes):
+        body = body.decode('utf-8', 'replace')
+    try:
+        data = json.loads(body)
+    except ValueError:
+        fields = [(key, "" if key in REDACTED_FIELDS else value) for key, value in parse_qsl(body, keep_blank_values=True)]
+        return urlencode(sorted(fields))
+    if isinstance(data, dict):
+        data = {key: None if key in REDACTED_FIELDS else bool(value) if key in DATED_FIELDS else value for key, value in data.items()}
+    return json.dumps(data, sort_keys=True)
+
+
+def request_key(method: str, url: str, body) -> str:
+    return hashlib.sha256(f"{method.upper()} {url}\n{_normalize_body(body)}".encode()).hexdigest()
+
+
+def load_archive(path: str) -> dict:
+    """Recorded responses by request key, in recording order"""
+    responses = defaultdict(list)
+    with gzip.open(path, 'rt') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                responses[record['key']].append(record)
+    return responses
+
+
+def build_response(request, record: dict) -> requests.Response:
+    response = requests.Response()
+    response.status_code = record['status']
+    response.headers = CaseInsensitiveDict(record['headers'])
+    response._content = base64.b64decode(record['content'])
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers) or 'utf-8'
+    response.url = request.url
+    response.request = request
+    response.reason = "Replayed"
+    return response
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Regular transport that also appends every exchange to a gzip JSON lines archive"""
+
+    _lock = threading.Lock()
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        record = {
+            'key': request_key(request.method, request.url, request.body),
+            'method': request.method,
+            'url': request.url,
+            'status': response.status_code,
+            'headers': {name: value for name, value in response.headers.items() if name.lower() not in DROPPED_HEADERS},
+            'content': base64.b64encode(response.content).decode(),
+            'elapsed': response.elapsed.total_seconds(),
+        }
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with gzip.open(self.path, 'at') as f:
+                f.write(json.dumps(record) + "\n")
+        return response
+
+
+class Replayer:
+    """Serves recorded responses in order, repeating the last one, with simulated latency and concurrency"""
+
+    def __init__(self, path: str, latency: float = 0, concurrency: int = 0):
+        self.responses = load_archive(path)
+        self.latency = latency
+        self._positions = defaultdict(int)
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(concurrency) if concurrency > 0 else None
+
+    def lookup(self, method: str, url: str, body) -> dict | None:
+        key = request_key(method, url, body)
+        with self._lock:
+            records = self.responses.get(key)
+            if not records:
+                return None
+            position = self._positions[key]
+            self._positions[key] = min(position + 1, len(records) - 1)
+            return records[position]
+
+    def wait(self):
+        if self._slots is not None:
+            self._slots.acquire()
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+        finally:
+            if self._slots is not None:
+                self._slots.release()
+
+
+class ReplayAdapter(BaseAdapter):
+    """Transport answering from an archive instead of the network"""
+
+    def __init__(self, replayer: Replayer):
+        super().__init__()
+        self.replayer = replayer
+
+    def send(self, request, **kwargs):
+        record = self.replayer.lookup(request.method, request.url, request.body)
+        if record is None:
+            raise requests.ConnectionError(f"No recorded response for {request.method} {request.url}", request=request)
+        self.replayer.wait()
+        return build_response(request, record)
+
+    def close(self):
+        pass
+
+
+class StandInAdapter(HTTPAdapter):
+    """Transport sending every request to the stand-in server, the original URL in the path"""
+
+    def __init__(self, server: str, **kwargs):
+        super().__init__(**kwargs)
+        self.server = server.rstrip("/")
+
+    def send(self, request, **kwargs):
+        original = urlsplit(request.url)
+        request.url = f"{self.server}/{original.scheme}/{original.netloc}{original.path or '/'}" + (f"?{original.query}" if original.query else "")
+        request.headers.pop('Host', None)
+        return super().send(request, **kwargs)
+
+
+_replayers = {}
+_replayers_lock = threading.Lock()
+
+
+def mount(session: requests.Session, pool_size: int):
+    """Mount the record, replay or stand-in transport selected by the environment, if any"""
+    if os.environ.get("HTTP_REPLAY"):
+        path = os.environ["HTTP_REPLAY"]
+        with _replayers_lock:
+            if path not in _replayers:
+                _replayers[path] = Replayer(path, float(os.environ.get("HTTP_REPLAY_LATENCY", 0)), int(os.environ.get("HTTP_REPLAY_CONCURRENCY", 0)))
+        adapter = ReplayAdapter(_replayers[path])
+    elif os.environ.get("HTTP_REPLAY_SERVER"):
+        adapter = StandInAdapter(os.environ["HTTP_REPLAY_SERVER"], pool_connections=pool_size, pool_maxsize=pool_size)
+    elif os.environ.get("HTTP_RECORD"):
+        adapter = RecordingAdapter(os.environ["HTTP_RECORD"], pool_connections=pool_size, pool_maxsize=pool_size)
+    else:
+        return
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+
+def serve(path: str, port: int, latency: float, concurrency: int):
+    replayer = Replayer(path, latency, concurrency)
+
+    class Handler(BaseHTTPRequestHandler):
+        def _replay(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0)) or None
+            scheme, _, rest = self.path.lstrip("/").partition("/")
+            host, _, path_query = rest.partition("/")
+            record = replayer.lookup(self.command, f"{scheme}://{host}/{path_query}", body)
+            if record is None:
+                self.send_error(404, "No recorded response")
+                return
+            replayer.wait()
+            content = base64.b64decode(record['content'])
+            self.send_response(record['status'])
+            for name, value in record['headers'].items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        do_GET = do_POST = do_HEAD = _replay
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    print(f"Serving {sum(len(records) for records in replayer.responses.values())} recorded responses on http://127.0.0.1:{port}")
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="Serve an archive on a local stand-in server")
+    serve_parser.add_argument("archive")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--latency", type=float, default=0, help="Seconds added to every response")
+    serve_parser.add_argument("--concurrency", type=int, default=0, help="Requests served at once, 0 for no limit")
+    list_parser = commands.add_parser("list", help="List the requests of an archive")
+    list_parser.add_argument("archive")
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args.archive, args.port, args.latency, args.concurrency)
+    else:
+        for records in load_archive(args.archive).values():
+            for record in records:
+                print(record['status'], record['method'], record['url'], f"{len(record['content']) * 3 // 4} B", f"{record['elapsed'] * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
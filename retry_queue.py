@@ -0,0 +1,55 @@
+import json
+import os
+import time
+
+from competitions import SEASON, season_file
+
+QUEUE_PATH = season_file(SEASON, "retry_queue.json")
+# Delay before a failed game is tried again, doubled after each failure up to the maximum
+RETRY_DELAY = int(os.environ.get("PENS_RETRY_DELAY", 300))
+RETRY_MAX_DELAY = int(os.environ.get("PENS_RETRY_MAX_DELAY", 24 * 3600))
+
+
+class RetryQueue:
+    """
+    Games whose fetch failed, persisted between runs:
+    {"1234": {"competition": "magnus", "attempts": 2, "error": "...", "retry_at": 1700000000.0}}
+    A game stays queued until it is fetched, each failure pushing its next attempt further.
+    """
+
+    def __init__(self, path: str = QUEUE_PATH):
+        self.path = path
+        self.games = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.games = {int(game_id): entry for game_id, entry in json.load(f).items()}
+
+    def __contains__(self, game_id) -> bool:
+        return int(game_id) in self.games
+
+    def __len__(self) -> int:
+        return len(self.games)
+
+    def due(self, game_id, now: float = None) -> bool:
+        """Whether a game may be fetched now, always true for games that never failed"""
+        entry = self.games.get(int(game_id))
+        return entry is None or entry['retry_at'] <= (time.time() if now is None else now)
+
+    def failed(self, game_id, competition: str, error: str):
+        game_id = int(game_id)
+        attempts = self.games.get(game_id, {}).get('attempts', 0) + 1
+        self.games[game_id] = {
+            'competition': competition,
+            'attempts': attempts,
+            'error': error,
+            'retry_at': time.time() + min(RETRY_MAX_DELAY, RETRY_DELAY * 2 ** (attempts - 1)),
+        }
+
+    def succeeded(self, game_id):
+        self.games.pop(int(game_id), None)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".tmp", 'w') as f:
+            json.dump({str(game_id): entry for game_id, entry in sorted(self.games.items())}, f, indent=4)
+        os.replace(self.path + ".tmp", self.path)
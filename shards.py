@@ -0,0 +1,47 @@
+import hashlib
+import json
+from contextlib import ExitStack
+
+from output import open_output
+
+
+def month_key(date: str) -> str:
+    """'2025-10' for a DD/MM/YYYY date, so that shards sort chronologically"""
+    parts = date.split("/")
+    if len(parts) != 3:
+        return "other"
+    return f"{parts[2]}-{parts[1]}"
+
+
+def write_shards(directory: str, columns: list, rows, date_column: int) -> dict:
+    """
+    Write rows as one compact JSON array per month in directory, as they are produced, and
+    an index.json listing the columns and the shards with their row count and content version.
+    Shards are listed in the order of their first row and rows keep their order within a shard,
+    so reading the shards in turn gives the rows back in the order they were produced
+    when months are not interleaved (rows sorted by date, either way).
+    """
+    shards = {}  # month -> [file, row count, digest]
+    with ExitStack() as stack:
+        for row in rows:
+            key = month_key(row[date_column])
+            shard = shards.get(key)
+            if shard is None:
+                shard = shards[key] = [stack.enter_context(open_output(f"{directory}/{key}.json")), 0, hashlib.sha256()]
+                shard[0].write("[")
+            text = ("," if shard[1] else "") + json.dumps(list(row), ensure_ascii=False, separators=(",", ":"))
+            shard[0].write(text)
+            shard[1] += 1
+            shard[2].update(text.encode())
+        for shard in shards.values():
+            shard[0].write("]")
+
+    index = {
+        'columns': columns,
+        'rows': sum(shard[1] for shard in shards.values()),
+        # The version changes with the content so that browsers never use a stale cached shard
+        'shards': [{'file': f"{key}.json", 'version': shard[2].hexdigest()[:12], 'rows': shard[1]} for key, shard in shards.items()],
+    }
+    with open_output(f"{directory}/index.json") as f:
+        json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+    return index
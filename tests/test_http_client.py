@@ -0,0 +1,89 @@
+import time
+from datetime import timedelta
+
+import pytest
+import requests
+
+from http_client import CircuitOpenError, RequestScheduler
+
+URL = "https://example.org/page"
+COOLDOWN = 0.2
+
+
+def response(status: int) -> requests.Response:
+    r = requests.Response()
+    r.status_code = status
+    r.elapsed = timedelta(0)
+    r.url = URL
+    return r
+
+
+def request() -> requests.PreparedRequest:
+    return requests.Request("GET", URL).prepare()
+
+
+def failing():
+    raise requests.ConnectionError("refused")
+
+
+def open_circuit(scheduler: RequestScheduler):
+    for _ in range(scheduler.breaker_threshold):
+        with pytest.raises(requests.ConnectionError):
+            scheduler.send(request(), failing)
+    assert scheduler.host("example.org").opened_at is not None
+
+
+def scheduler(**kwargs) -> RequestScheduler:
+    return RequestScheduler(max_retries=0, breaker_threshold=5, breaker_cooldown=COOLDOWN, **kwargs)
+
+
+def test_open_half_open_closed():
+    s = scheduler()
+    open_circuit(s)
+    # Open: rejected without sending
+    with pytest.raises(CircuitOpenError):
+        s.send(request(), lambda: pytest.fail("sent while the circuit is open"))
+    time.sleep(COOLDOWN)
+    # Half open: the probe is sent and its success closes the circuit
+    assert s.send(request(), lambda: response(200)).status_code == 200
+    state = s.host("example.org")
+    assert state.opened_at is None and not state.probing and state.failures == 0
+    assert s.send(request(), lambda: response(200)).status_code == 200
+
+
+def test_failed_probe_reopens():
+    s = scheduler()
+    open_circuit(s)
+    time.sleep(COOLDOWN)
+    with pytest.raises(requests.ConnectionError):
+        s.send(request(), failing)
+    state = s.host("example.org")
+    assert state.opened_at is not None and not state.probing
+    with pytest.raises(CircuitOpenError):
+        s.send(request(), lambda: response(200))
+    time.sleep(COOLDOWN)
+    assert s.send(request(), lambda: response(200)).status_code == 200
+
+
+def test_probe_waiting_for_a_token():
+    # The probe has no token left after the failures and waits for one instead of rejecting itself
+    s = scheduler(rate=2, burst=1)
+    open_circuit(s)
+    time.sleep(COOLDOWN)
+    state = s.host("example.org")
+    state.tokens, state.refilled_at = 0.0, time.monotonic()
+    assert s.send(request(), lambda: response(200)).status_code == 200
+    assert state.opened_at is None and not state.probing
+
+
+def test_only_the_probe_is_let_through():
+    s = scheduler()
+    open_circuit(s)
+    time.sleep(COOLDOWN)
+    state = s.host("example.org")
+    probe = s._acquire("example.org", state)
+    assert probe and state.probing
+    with pytest.raises(CircuitOpenError):
+        s._acquire("example.org", state)
+    s._release("example.org", state, True, probe=probe)
+    assert state.opened_at is None and not state.probing
@@ -1,23 +1,22 @@
+import argparse
 import csv
+import itertools
+import logging
+import os
 import re
-from get_design import main as get_design
+from competitions import SEASON, output_dir
+from designations import Designations, load as load_parsed_designations
 from datetime import datetime
 from collections import defaultdict
+import metrics
+from referee_index import RefereeIndex
+from render import render_template
 
-def parse_referee_names(ref_string):
-    """Extract referee names from a string like 'M DUPONT Jean, Mme MARTIN Marie'"""
-    if not ref_string:
-        return []
-    
-    refs = []
-    refNames = ref_string.split(', ')
-    for refName in refNames:
-        refMatch = re.match(r"M(?:me)? ([A-Z \-']+) ([A-Z][\w \-']+)", refName)
-        if refMatch:
-            lastName = refMatch.group(1)
-            firstName = refMatch.group(2)
-            refs.append((lastName, firstName))
-    return refs
+logger = logging.getLogger(__name__)
+
+SLM = 'Synerglace Ligue Magnus'
+MONTH_ORDER = ['Janvier', 'Février', 'Mars', 'Avril', 'Mai', 'Juin',
+               'Juillet', 'Août', 'Septembre', 'Octobre', 'Novembre', 'Décembre']
 
 def parse_date(date_str):
     """Parse date from DD/MM/YYYY format"""
@@ -26,71 +25,29 @@ def parse_date(date_str):
 def get_month_name(date_str):
     """Get month name from date string"""
     dt = parse_date(date_str)
-    months = ['Janvier', 'Février', 'Mars', 'Avril', 'Mai', 'Juin',
-              'Juillet', 'Août', 'Septembre', 'Octobre', 'Novembre', 'Décembre']
-    return months[dt.month - 1]
+    return MONTH_ORDER[dt.month - 1]
 
-def main():
-    # Get raw designations from get_design (1 row per game)
-    designations = get_design().splitlines()
-    print(f"Fetched {len(designations) - 1} games")
-    
-    reader = csv.reader(designations, delimiter=';', quotechar='"')
-    next(reader)  # Skip header
-    
-    # Data structures
-    games = []
-    slm_refs = defaultdict(int)  # ref -> game count in SLM
-    
-    # Parse all games
-    for row in reader:
-        if len(row) < 7:
-            continue
-            
-        competition = row[0]
-        phase = row[1]
-        date = row[2]
-        time = row[3]
-        location = row[4]
-        teams = row[5]
-        
-        # Extract all referees from columns 6 onwards
-        refs = []
-        for col in range(6, 9):
-            refs.extend(parse_referee_names(row[col]))
-        
-        game_data = {
-            'competition': competition,
-            'phase': phase,
-            'date': date,
-            'time': time,
-            'location': location,
-            'teams': teams,
-            'refs': refs
-        }
-        games.append(game_data)
-        
-        # Count SLM refs
-        if competition == 'Synerglace Ligue Magnus':
-            for ref in refs:
-                slm_refs[ref] += 1
-    
-    # Filter SLM refs with at least 3 games
-    slm_refs_qualified = {ref for ref, count in slm_refs.items() if count >= 3}
-    print(f"\nFound {len(slm_refs_qualified)} SLM refs with at least 3 games")
-    
-    # Group games by date
-    games_by_date = defaultdict(list)
-    for game in games:
-        games_by_date[game['date']].append(game)
-    
-    # Analyze days with 5+ SLM games
-    print("\n" + "="*80)
-    print("ANALYSIS OF DAYS WITH 5+ SLM GAMES")
-    print("="*80)
-    
-    # Sort dates properly
-    sorted_dates = sorted(games_by_date.keys(), key=parse_date)
+def get_month_key(date_str):
+    """(year, month) of a date string, so that the same month of two seasons is not merged"""
+    dt = parse_date(date_str)
+    return dt.year, dt.month
+
+def month_label(month_key):
+    year, month = month_key
+    return f"{MONTH_ORDER[month - 1]} {year}"
+
+def build_index(designations: Designations) -> RefereeIndex:
+    """Referee x date x competition assignments, as bitsets of referee ids"""
+    return RefereeIndex(designations)
+
+def analyze(index: RefereeIndex, competition: str = SLM, min_ref_games: int = 3, min_day_games: int = 5) -> dict:
+    """
+    Staying-home statistics for one competition: referees with at least min_ref_games games
+    in it are qualified, and only days with at least min_day_games of its games are analyzed
+    """
+    qualified = index.qualified(competition, min_ref_games)
+    slm_refs_qualified = set(index.referees_of(qualified))
+    total_slm_refs = len(slm_refs_qualified)
     
     # Store statistics for later aggregation
     daily_stats = []
@@ -112,112 +69,105 @@ def main():
         'total_slm_games': 0
     }
     
-    for date in sorted_dates:
-        date_games = games_by_date[date]
-        slm_games = [g for g in date_games if g['competition'] == 'Synerglace Ligue Magnus']
+    for date in index.dates:
+        slm_games_count = index.games_on(date, competition)
+        if slm_games_count < min_day_games:
+            continue
         
-        if len(slm_games) >= 5:
-            # Get all refs appointed on SLM games this day
-            slm_refs_on_slm_games = set()
-            non_slm_refs_on_slm_games = set()
-            
-            for game in slm_games:
-                for ref in game['refs']:
-                    if ref in slm_refs_qualified:
-                        slm_refs_on_slm_games.add(ref)
-                    else:
-                        non_slm_refs_on_slm_games.add(ref)
-            
-            # Get SLM refs working on other competitions this day
-            slm_refs_on_other_games = set()
-            for game in date_games:
-                if game['competition'] != 'Synerglace Ligue Magnus':
-                    for ref in game['refs']:
-                        if ref in slm_refs_qualified:
-                            slm_refs_on_other_games.add(ref)
-            
-            # Get all refs with any appointment this day
-            all_refs_working = set()
-            for game in date_games:
-                for ref in game['refs']:
-                    if ref in slm_refs_qualified:
-                        all_refs_working.add(ref)
-            
-            # Calculate staying home (not working at all)
-            slm_refs_staying_home = slm_refs_qualified - all_refs_working
-            
-            # Calculate total not assigned on SLM
-            slm_refs_not_on_slm = slm_refs_qualified - slm_refs_on_slm_games
-            
-            # Calculate percentages
-            total_slm_refs = len(slm_refs_qualified)
-            pct_not_on_slm = (len(slm_refs_not_on_slm) / total_slm_refs * 100) if total_slm_refs > 0 else 0
-            pct_staying_home = (len(slm_refs_staying_home) / total_slm_refs * 100) if total_slm_refs > 0 else 0
-            
-            # Store stats for this day
-            day_stat = {
-                'date': date,
-                'total_slm_games': len(slm_games),
-                'slm_refs_on_slm': len(slm_refs_on_slm_games),
-                'non_slm_refs_on_slm': len(non_slm_refs_on_slm_games),
-                'slm_refs_not_on_slm': len(slm_refs_not_on_slm),
-                'staying_home': len(slm_refs_staying_home),
-                'working_other': len(slm_refs_on_other_games),
-                'pct_not_on_slm': pct_not_on_slm,
-                'pct_staying_home': pct_staying_home,
-                'staying_home_list': sorted(slm_refs_staying_home),
-                'working_other_list': sorted(slm_refs_on_other_games),
-                'working_other_details': {}
-            }
-            
-            # Get details of what competitions they're working
-            for ref in slm_refs_on_other_games:
-                competitions = set()
-                for game in date_games:
-                    if game['competition'] != 'Synerglace Ligue Magnus' and ref in game['refs']:
-                        competitions.add(game['competition'])
-                day_stat['working_other_details'][ref] = competitions
-            
-            daily_stats.append(day_stat)
-            
-            # Update monthly stats
-            month_name = get_month_name(date)
-            monthly_stats[month_name]['total_slm_refs_not_on_slm'] += len(slm_refs_not_on_slm)
-            monthly_stats[month_name]['total_staying_home'] += len(slm_refs_staying_home)
-            monthly_stats[month_name]['total_working_other'] += len(slm_refs_on_other_games)
-            monthly_stats[month_name]['total_slm_refs_on_slm'] += len(slm_refs_on_slm_games)
-            monthly_stats[month_name]['days_count'] += 1
-            monthly_stats[month_name]['total_slm_games'] += len(slm_games)
-            
-            # Update global stats
-            global_stats['total_slm_refs_not_on_slm'] += len(slm_refs_not_on_slm)
-            global_stats['total_staying_home'] += len(slm_refs_staying_home)
-            global_stats['total_working_other'] += len(slm_refs_on_other_games)
-            global_stats['total_slm_refs_on_slm'] += len(slm_refs_on_slm_games)
-            global_stats['days_count'] += 1
-            global_stats['total_slm_games'] += len(slm_games)
-            
-            # Console output
-            print(f"\n📅 Date: {date}")
-            print(f"   Total SLM games: {len(slm_games)}")
-            print(f"   SLM refs appointed to SLM games: {len(slm_refs_on_slm_games)}")
-            print(f"   Non-SLM refs appointed to SLM games: {len(non_slm_refs_on_slm_games)}")
-            print(f"   Total SLM refs non désigné en SLM: {len(slm_refs_not_on_slm)} ({pct_not_on_slm:.1f}%)")
-            print(f"      - Staying home (no assignment): {len(slm_refs_staying_home)} ({pct_staying_home:.1f}%)")
-            print(f"      - Working other divisions: {len(slm_refs_on_other_games)}")
-            
-            # Details of refs staying home
-            if day_stat['staying_home_list']:
-                print(f"\n   📋 SLM refs staying home:")
-                for ref in day_stat['staying_home_list']:
-                    print(f"      - {ref[0]} {ref[1]}")
-            
-            # Details of refs working other divisions
-            if day_stat['working_other_list']:
-                print(f"\n   📋 SLM refs working other divisions:")
-                for ref in day_stat['working_other_list']:
-                    competitions = day_stat['working_other_details'][ref]
-                    print(f"      - {ref[0]} {ref[1]}: {', '.join(competitions)}")
+        # Refs appointed on the competition games and on other competitions this day
+        on_slm = index.assigned(date, competition)
+        on_other = index.assigned_elsewhere(date, competition)
+        
+        slm_refs_on_slm_games = on_slm & qualified
+        non_slm_refs_on_slm_games = on_slm & ~qualified
+        slm_refs_on_other_games = on_other & qualified
+        
+        # Calculate staying home (not working at all)
+        slm_refs_staying_home = qualified & ~(on_slm | on_other)
+        
+        # Calculate total not assigned on the competition
+        slm_refs_not_on_slm = qualified & ~slm_refs_on_slm_games
+        
+        # Calculate percentages
+        pct_not_on_slm = (slm_refs_not_on_slm.bit_count() / total_slm_refs * 100) if total_slm_refs > 0 else 0
+        pct_staying_home = (slm_refs_staying_home.bit_count() / total_slm_refs * 100) if total_slm_refs > 0 else 0
+        
+        # Store stats for this day
+        day_stat = {
+            'date': date,
+            'total_slm_games': slm_games_count,
+            'slm_refs_on_slm': slm_refs_on_slm_games.bit_count(),
+            'non_slm_refs_on_slm': non_slm_refs_on_slm_games.bit_count(),
+            'slm_refs_not_on_slm': slm_refs_not_on_slm.bit_count(),
+            'staying_home': slm_refs_staying_home.bit_count(),
+            'working_other': slm_refs_on_other_games.bit_count(),
+            'pct_not_on_slm': pct_not_on_slm,
+            'pct_staying_home': pct_staying_home,
+            'staying_home_list': sorted(index.referees_of(slm_refs_staying_home)),
+            'working_other_list': sorted(index.referees_of(slm_refs_on_other_games)),
+            'working_other_details': {}
+        }
+        
+        # Get details of what competitions they're working
+        for ref in day_stat['working_other_list']:
+            day_stat['working_other_details'][ref] = index.competitions_of(date, ref, excluded=competition)
+        
+        daily_stats.append(day_stat)
+        
+        # Update monthly and global stats
+        for stats in (monthly_stats[get_month_key(date)], global_stats):
+            stats['total_slm_refs_not_on_slm'] += day_stat['slm_refs_not_on_slm']
+            stats['total_staying_home'] += day_stat['staying_home']
+            stats['total_working_other'] += day_stat['working_other']
+            stats['total_slm_refs_on_slm'] += day_stat['slm_refs_on_slm']
+            stats['days_count'] += 1
+            stats['total_slm_games'] += slm_games_count
+    
+    return {
+        'competition': competition,
+        'min_ref_games': min_ref_games,
+        'min_day_games': min_day_games,
+        'daily_stats': daily_stats,
+        'global_stats': global_stats,
+        'monthly_stats': monthly_stats,
+        'slm_refs_qualified': slm_refs_qualified,
+    }
+
+def print_report(analysis: dict):
+    daily_stats = analysis['daily_stats']
+    global_stats = analysis['global_stats']
+    monthly_stats = analysis['monthly_stats']
+    slm_refs_qualified = analysis['slm_refs_qualified']
+    
+    print(f"\nFound {len(slm_refs_qualified)} SLM refs with at least 3 games")
+    
+    # Analyze days with 5+ SLM games
+    print("\n" + "="*80)
+    print("ANALYSIS OF DAYS WITH 5+ SLM GAMES")
+    print("="*80)
+    
+    for day_stat in daily_stats:
+        # Console output
+        print(f"\n📅 Date: {day_stat['date']}")
+        print(f"   Total SLM games: {day_stat['total_slm_games']}")
+        print(f"   SLM refs appointed to SLM games: {day_stat['slm_refs_on_slm']}")
+        print(f"   Non-SLM refs appointed to SLM games: {day_stat['non_slm_refs_on_slm']}")
+        print(f"   Total SLM refs non désigné en SLM: {day_stat['slm_refs_not_on_slm']} ({day_stat['pct_not_on_slm']:.1f}%)")
+        print(f"      - Staying home (no assignment): {day_stat['staying_home']} ({day_stat['pct_staying_home']:.1f}%)")
+        print(f"      - Working other divisions: {day_stat['working_other']}")
+        
+        # Details of refs staying home
+        if day_stat['staying_home_list']:
+            print(f"\n   📋 SLM refs staying home:")
+            for ref in day_stat['staying_home_list']:
+                print(f"      - {ref[0]} {ref[1]}")
+        
+        # Details of refs working other divisions
+        if day_stat['working_other_list']:
+            print(f"\n   📋 SLM refs working other divisions:")
+            for ref in day_stat['working_other_list']:
+                competitions = day_stat['working_other_details'][ref]
+                print(f"      - {ref[0]} {ref[1]}: {', '.join(competitions)}")
     
     # Print global statistics
     print("\n" + "="*80)
@@ -242,35 +192,84 @@ def main():
     print("MONTHLY STATISTICS")
     print("="*80)
     
-    month_order = ['Janvier', 'Février', 'Mars', 'Avril', 'Mai', 'Juin',
-                   'Juillet', 'Août', 'Septembre', 'Octobre', 'Novembre', 'Décembre']
+    for month in sorted(monthly_stats):
+        stats = monthly_stats[month]
+        print(f"\n{month_label(month)}:")
+        print(f"  Days with 5+ SLM games: {stats['days_count']}")
+        print(f"  Total SLM games: {stats['total_slm_games']}")
+        if stats['days_count'] > 0:
+            avg_not_on_slm = stats['total_slm_refs_not_on_slm'] / stats['days_count']
+            avg_staying_home = stats['total_staying_home'] / stats['days_count']
+            avg_working_other = stats['total_working_other'] / stats['days_count']
+            total_slm_refs = len(slm_refs_qualified)
+            
+            print(f"  Average per day:")
+            print(f"    - SLM refs non désigné en SLM: {avg_not_on_slm:.1f} ({avg_not_on_slm/total_slm_refs*100:.1f}%)")
+            print(f"    - SLM refs staying home: {avg_staying_home:.1f} ({avg_staying_home/total_slm_refs*100:.1f}%)")
+            print(f"    - SLM refs working other divisions: {avg_working_other:.1f}")
+
+def main(designations: Designations = None, season: int = SEASON, console: bool = True):
+    # Get designations shared with the other stages (1 game per row)
+    if designations is None:
+        designations = load_parsed_designations(season)
+    logger.info("Fetched %d games", len(designations) + len(designations.skipped))
     
-    for month in month_order:
-        if month in monthly_stats:
-            stats = monthly_stats[month]
-            print(f"\n{month}:")
-            print(f"  Days with 5+ SLM games: {stats['days_count']}")
-            print(f"  Total SLM games: {stats['total_slm_games']}")
-            if stats['days_count'] > 0:
-                avg_not_on_slm = stats['total_slm_refs_not_on_slm'] / stats['days_count']
-                avg_staying_home = stats['total_staying_home'] / stats['days_count']
-                avg_working_other = stats['total_working_other'] / stats['days_count']
-                total_slm_refs = len(slm_refs_qualified)
-                
-                print(f"  Average per day:")
-                print(f"    - SLM refs non désigné en SLM: {avg_not_on_slm:.1f} ({avg_not_on_slm/total_slm_refs*100:.1f}%)")
-                print(f"    - SLM refs staying home: {avg_staying_home:.1f} ({avg_staying_home/total_slm_refs*100:.1f}%)")
-                print(f"    - SLM refs working other divisions: {avg_working_other:.1f}")
+    analysis = analyze(build_index(designations))
+    if console:
+        print_report(analysis)
     
     # Generate HTML report
-    generate_html_report(daily_stats, global_stats, monthly_stats, slm_refs_qualified, month_order)
-    print("\n✅ HTML report generated: data/staying_home.html")
+    output_path = f"{output_dir(season)}/staying_home.html"
+    generate_html_report(analysis['daily_stats'], analysis['global_stats'], analysis['monthly_stats'], analysis['slm_refs_qualified'], output_path)
+    logger.info("HTML report generated: %s", output_path)
+
+def write_sweep_csv(analysis: dict, path: str):
+    """Daily statistics of one sweep combination"""
+    with open(path, 'w') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Date", "Matchs", "Qualifiés désignés", "Non qualifiés désignés", "Non désignés",
+                         "Restant à domicile", "Autres divisions", "% Non désignés", "% Restant à domicile"])
+        for day in analysis['daily_stats']:
+            writer.writerow([day['date'], day['total_slm_games'], day['slm_refs_on_slm'], day['non_slm_refs_on_slm'],
+                             day['slm_refs_not_on_slm'], day['staying_home'], day['working_other'],
+                             f"{day['pct_not_on_slm']:.1f}", f"{day['pct_staying_home']:.1f}"])
 
-def generate_html_report(daily_stats, global_stats, monthly_stats, slm_refs_qualified, month_order):
+def sweep(index: RefereeIndex, competitions: list, min_ref_games_values: list, min_day_games_values: list, output_dir: str = "data/staying_home_sweep") -> list:
+    """
+    Analyze every (competition, min_ref_games, min_day_games) combination against the same index,
+    writing one daily CSV per combination and a summary.csv with one line per combination
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    analyses = []
+    with open(os.path.join(output_dir, "summary.csv"), 'w') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Compétition", "Matchs min. arbitre", "Matchs min. journée", "Arbitres qualifiés", "Journées",
+                         "Moy. Non désignés", "Moy. Restant à domicile", "Moy. Autres divisions", "Fichier"])
+        for competition, min_ref_games, min_day_games in itertools.product(competitions, min_ref_games_values, min_day_games_values):
+            analysis = analyze(index, competition, min_ref_games, min_day_games)
+            slug = re.sub(r"[^a-z0-9]+", "_", competition.lower()).strip("_")
+            file_name = f"{slug}_{min_ref_games}_{min_day_games}.csv"
+            write_sweep_csv(analysis, os.path.join(output_dir, file_name))
+            stats = analysis['global_stats']
+            days = stats['days_count'] or 1
+            writer.writerow([competition, min_ref_games, min_day_games, len(analysis['slm_refs_qualified']), stats['days_count'],
+                             f"{stats['total_slm_refs_not_on_slm'] / days:.1f}", f"{stats['total_staying_home'] / days:.1f}",
+                             f"{stats['total_working_other'] / days:.1f}", file_name])
+            analyses.append(analysis)
+    logger.info("Wrote %d combinations to %s", len(analyses), output_dir)
+    return analyses
+
+def generate_html_report(daily_stats, global_stats, monthly_stats, slm_refs_qualified, output_path="data/staying_home.html"):
     """Generate HTML report with statistics"""
+    render_template("template_staying_home.html", output_path,
+                    report_chunks(daily_stats, global_stats, monthly_stats, slm_refs_qualified), placeholder="%CONTENT%",
+                    values={"%TITLE%": "Statistiques Arbitres SLM - Absences"})
+
+def report_chunks(daily_stats, global_stats, monthly_stats, slm_refs_qualified):
+    """Report content one section at a time, so at most one day is held in memory"""
     total_slm_refs = len(slm_refs_qualified)
     
-    content = """<h1>Statistiques Arbitres SLM - Absences sur Journées à 5+ Matchs</h1>
+    yield """<h1>Statistiques Arbitres SLM - Absences sur Journées à 5+ Matchs</h1>
     
     <h2>Statistiques Globales</h2>
     <table>
@@ -324,7 +323,7 @@ def generate_html_report(daily_stats, global_stats, monthly_stats, slm_refs_qual
     )
     
     # Monthly statistics
-    content += "\n    <h2>Statistiques Mensuelles</h2>\n"
+    content = "\n    <h2>Statistiques Mensuelles</h2>\n"
     content += """    <table>
         <thead>
             <tr>
@@ -341,16 +340,15 @@ def generate_html_report(daily_stats, global_stats, monthly_stats, slm_refs_qual
         <tbody>
 """
     
-    for month in month_order:
-        if month in monthly_stats:
-            stats = monthly_stats[month]
-            if stats['days_count'] > 0:
-                avg_not_on_slm = stats['total_slm_refs_not_on_slm'] / stats['days_count']
-                avg_staying_home = stats['total_staying_home'] / stats['days_count']
-                avg_working_other = stats['total_working_other'] / stats['days_count']
-                
-                content += f"""            <tr>
-                <td><strong>{month}</strong></td>
+    for month in sorted(monthly_stats):
+        stats = monthly_stats[month]
+        if stats['days_count'] > 0:
+            avg_not_on_slm = stats['total_slm_refs_not_on_slm'] / stats['days_count']
+            avg_staying_home = stats['total_staying_home'] / stats['days_count']
+            avg_working_other = stats['total_working_other'] / stats['days_count']
+            
+            content += f"""            <tr>
+                <td><strong>{month_label(month)}</strong></td>
                 <td>{stats['days_count']}</td>
                 <td>{stats['total_slm_games']}</td>
                 <td>{avg_not_on_slm:.1f}</td>
@@ -366,10 +364,11 @@ def generate_html_report(daily_stats, global_stats, monthly_stats, slm_refs_qual
     
     <h2>Détails par Journée</h2>
 """
+    yield content
     
     # Daily details
     for day in daily_stats:
-        content += f"""
+        content = f"""
     <details class="day-section">
         <summary style="cursor: pointer; font-size: 1.2em; font-weight: bold; padding: 10px; margin: -20px -20px 20px -20px; background-color: #3498db; color: white; border-radius: 5px 5px 0 0;">
             📅 {day['date']} - {day['total_slm_games']} matchs SLM - {day['staying_home']} arbitres à domicile ({day['pct_staying_home']:.1f}%)
@@ -436,15 +435,20 @@ def generate_html_report(daily_stats, global_stats, monthly_stats, slm_refs_qual
             content += "            </ul>\n        </details>\n"
         
         content += "    </details>\n"
-    
-    # Load template and insert content
-    with open("template_staying_home.html", 'r') as f:
-        template = f.read()
-    
-    html = template.replace("%CONTENT%", content)
-    
-    with open("data/staying_home.html", "w") as f:
-        f.write(html)
+        yield content
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Staying-home analysis of qualified referees")
+    parser.add_argument("--competition", action="append", help="Competition to analyze, can be repeated")
+    parser.add_argument("--min-ref-games", type=int, nargs="+", help="Games in the competition for a referee to be qualified")
+    parser.add_argument("--min-day-games", type=int, nargs="+", help="Games of the competition for a day to be analyzed")
+    parser.add_argument("--output", default="data/staying_home_sweep", help="Directory of the sweep CSV files")
+    parser.add_argument("--season", type=int, action="append", help="Season to analyze, only its designations are loaded, can be repeated")
+    args = parser.parse_args()
+    metrics.configure_logging()
+    for season in args.season or [SEASON]:
+        if args.competition or args.min_ref_games or args.min_day_games:
+            output = args.output if season == SEASON else f"{args.output}/{season}"
+            sweep(build_index(load_parsed_designations(season)), args.competition or [SLM], args.min_ref_games or [3], args.min_day_games or [5], output)
+        else:
+            main(season=season)
@@ -0,0 +1,159 @@
+"""
+Referee conflicts and workload over every competition of a season, from the referee timelines:
+double bookings, short turnarounds between two venues and games played over rolling windows.
+
+    python track_workload.py
+    python track_workload.py --season 2025
+"""
+import argparse
+import html
+import logging
+import os
+
+import metrics
+from competitions import SEASON, output_dir
+from designations import Designations, load as load_parsed_designations
+from referee_timeline import RefereeTimeline, start_datetime
+from render import render_template
+
+logger = logging.getLogger(__name__)
+
+# Turnarounds shorter than this many minutes between the end of a game and the next one at another venue are reported
+MIN_REST_MINUTES = int(os.environ.get("WORKLOAD_MIN_REST", 90))
+# Rolling windows of the workload table, in days
+WORKLOAD_WINDOWS = [int(days) for days in os.environ.get("WORKLOAD_WINDOWS", "7,30").split(",")]
+
+
+def build_timeline(designations: Designations) -> RefereeTimeline:
+    """Games of each referee sorted by start time"""
+    return RefereeTimeline(designations)
+
+
+def analyze(timeline: RefereeTimeline, min_rest: int = MIN_REST_MINUTES, windows: list = WORKLOAD_WINDOWS) -> dict:
+    """
+    Double bookings (games overlapping), short turnarounds (less than min_rest minutes before a
+    game at another venue) and, for each referee, the most games played within each window of days
+    """
+    designations = timeline.designations
+    double_bookings = []
+    short_turnarounds = []
+    workload = []
+    for referee in sorted(timeline.starts, key=lambda referee: timeline.referees[referee]):
+        for previous, game, rest in timeline.transitions(referee):
+            if rest < 0:
+                double_bookings.append((timeline.referees[referee], previous, game, -rest))
+            elif rest < min_rest and designations.location[previous] != designations.location[game]:
+                short_turnarounds.append((timeline.referees[referee], previous, game, rest))
+        workload.append((timeline.referees[referee], len(timeline.starts[referee]),
+                         [timeline.max_rolling_count(referee, days * 24 * 60) for days in windows]))
+    workload.sort(key=lambda row: ([-count for count, _ in row[2]], -row[1], row[0]))
+    return {
+        'double_bookings': double_bookings,
+        'short_turnarounds': short_turnarounds,
+        'workload': workload,
+        'windows': windows,
+        'min_rest': min_rest,
+        'untimed': len(timeline.untimed),
+    }
+
+
+def game_label(timeline: RefereeTimeline, game: int) -> str:
+    competition, _, _, _, location, teams = timeline.designations.game(game)
+    return f"{start_datetime(timeline.start(game)):%d/%m/%Y %H:%M} - {competition} - {teams} ({location})"
+
+
+def print_report(timeline: RefereeTimeline, analysis: dict):
+    print(f"\nDouble bookings: {len(analysis['double_bookings'])}")
+    for referee, previous, game, overlap in analysis['double_bookings']:
+        print(f"   - {referee[0]} {referee[1]}: {game_label(timeline, previous)} / {game_label(timeline, game)}, {overlap} min overlap")
+    print(f"\nTurnarounds under {analysis['min_rest']} min between two venues: {len(analysis['short_turnarounds'])}")
+    for referee, previous, game, rest in analysis['short_turnarounds']:
+        print(f"   - {referee[0]} {referee[1]}: {game_label(timeline, previous)} / {game_label(timeline, game)}, {rest} min rest")
+    if analysis['untimed']:
+        print(f"\n{analysis['untimed']} games without a valid date and time were left out")
+
+
+def report_chunks(timeline: RefereeTimeline, analysis: dict):
+    """Report content one section at a time"""
+    yield "<h1>Arbitres - Conflits et charge</h1>\n"
+
+    yield f"""
+    <h2>Doubles désignations ({len(analysis['double_bookings'])})</h2>
+    <table>
+        <thead>
+            <tr>
+                <th>Arbitre</th>
+                <th>Match</th>
+                <th>Match suivant</th>
+                <th>Chevauchement (min)</th>
+            </tr>
+        </thead>
+        <tbody>
+"""
+    for referee, previous, game, overlap in analysis['double_bookings']:
+        yield (f"            <tr><td>{html.escape(f'{referee[0]} {referee[1]}')}</td><td>{html.escape(game_label(timeline, previous))}</td>"
+               f"<td>{html.escape(game_label(timeline, game))}</td><td>{overlap}</td></tr>\n")
+    yield "        </tbody>\n    </table>\n"
+
+    yield f"""
+    <h2>Enchaînements de moins de {analysis['min_rest']} min entre deux sites ({len(analysis['short_turnarounds'])})</h2>
+    <table>
+        <thead>
+            <tr>
+                <th>Arbitre</th>
+                <th>Match</th>
+                <th>Match suivant</th>
+                <th>Repos (min)</th>
+            </tr>
+        </thead>
+        <tbody>
+"""
+    for referee, previous, game, rest in analysis['short_turnarounds']:
+        yield (f"            <tr><td>{html.escape(f'{referee[0]} {referee[1]}')}</td><td>{html.escape(game_label(timeline, previous))}</td>"
+               f"<td>{html.escape(game_label(timeline, game))}</td><td>{rest}</td></tr>\n")
+    yield "        </tbody>\n    </table>\n"
+
+    columns = "".join(f"\n                <th>Max. sur {days} jours</th>" for days in analysis['windows'])
+    yield f"""
+    <h2>Charge par arbitre</h2>
+    <table>
+        <thead>
+            <tr>
+                <th>Arbitre</th>
+                <th>Matchs</th>{columns}
+            </tr>
+        </thead>
+        <tbody>
+"""
+    for referee, games, counts in analysis['workload']:
+        cells = "".join(f"<td>{count} (dès le {start_datetime(timeline.start(first)):%d/%m/%Y})</td>" for count, first in counts)
+        yield f"            <tr><td>{html.escape(f'{referee[0]} {referee[1]}')}</td><td>{games}</td>{cells}</tr>\n"
+    yield "        </tbody>\n    </table>\n"
+
+    if analysis['untimed']:
+        yield f"\n    <p>{analysis['untimed']} matchs sans date ou heure valide ne sont pas pris en compte.</p>\n"
+
+
+def main(designations: Designations = None, season: int = SEASON, console: bool = True):
+    if designations is None:
+        designations = load_parsed_designations(season)
+    timeline = build_timeline(designations)
+    analysis = analyze(timeline)
+    logger.info("%d referees, %d double bookings, %d short turnarounds", len(timeline),
+                len(analysis['double_bookings']), len(analysis['short_turnarounds']))
+    if console:
+        print_report(timeline, analysis)
+
+    output_path = f"{output_dir(season)}/workload.html"
+    render_template("template_staying_home.html", output_path, report_chunks(timeline, analysis), placeholder="%CONTENT%",
+                    values={"%TITLE%": "Arbitres - Conflits et charge"})
+    logger.info("HTML report generated: %s", output_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--season", type=int, action="append", help="Season to analyze, can be repeated (default: current season)")
+    args = parser.parse_args()
+    metrics.configure_logging()
+    for season in args.season or [SEASON]:
+        main(season=season)
@@ -0,0 +1,143 @@
+"""
+Long-running penalty exporter: keeps the session, the store and the schedules in memory and
+ingests games as soon as the league sites mark them finished.
+
+    python main.py watch
+
+Schedules are polled every WATCH_ACTIVE_INTERVAL seconds while games are being played,
+every WATCH_IDLE_INTERVAL seconds otherwise (waking up for the next game start). Polls only
+ask for the games of the previous, current and next day, the whole schedules are fetched
+again every WATCH_FULL_INTERVAL seconds. Game times are compared to the local time, run
+with TZ=Europe/Paris.
+"""
+import logging
+import os
+import signal
+import threading
+import time
+from datetime import datetime, timedelta
+
+import export_pens
+import metrics
+from competitions import SEASON, migrate_legacy, output_dir, season_competitions, season_file
+from penalty_stats import PenaltyAggregates
+from penalty_store import PenaltyStore
+from retry_queue import RetryQueue
+
+WATCH_ACTIVE_INTERVAL = int(os.environ.get("WATCH_ACTIVE_INTERVAL", 120))
+WATCH_IDLE_INTERVAL = int(os.environ.get("WATCH_IDLE_INTERVAL", 1800))
+WATCH_FULL_INTERVAL = int(os.environ.get("WATCH_FULL_INTERVAL", 6 * 3600))
+# A game is expected to end within this many seconds of its start, it is polled for until then
+GAME_DURATION = int(os.environ.get("WATCH_GAME_DURATION", 4 * 3600))
+GAME_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+logger = logging.getLogger(__name__)
+
+
+def game_start(game: dict) -> datetime | None:
+    try:
+        return datetime.strptime(game['date_rencontre_non_formate'], GAME_DATE_FORMAT)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class Watcher:
+    """State of the daemon between two polls: game states and start times, store and aggregates"""
+
+    def __init__(self, season: int = SEASON):
+        self.season = season
+        self.competitions = season_competitions(season)
+        self.pages = output_dir(season)
+        if season == SEASON:
+            migrate_legacy("penalties.jsonl", "penalty_aggregates.json", "retry_queue.json")
+        self.store = PenaltyStore(season_file(season, "penalties.jsonl"))
+        self.retry_queue = RetryQueue(season_file(season, "retry_queue.json"))
+        self.aggregates = PenaltyAggregates(season_file(season, "penalty_aggregates.json"))
+        self.states = {}  # game id -> etat
+        self.starts = {}  # game id -> start time, when the schedule gives it
+        self.finished_games = {competition.key: [] for competition in self.competitions}
+        self.full_polled_at = None
+
+    def poll(self, now: datetime = None) -> set:
+        """Fetch the schedules, ingest the games that finished since the last poll, returns the competitions re-rendered"""
+        now = now or datetime.now()
+        full = self.full_polled_at is None or time.time() - self.full_polled_at >= WATCH_FULL_INTERVAL
+        if full:
+            schedules = export_pens.get_schedules(self.competitions, ttl=0)
+            self.full_polled_at = time.time()
+        else:
+            schedules = export_pens.get_schedules(self.competitions, date_min=f"{now - timedelta(days=1):%Y-%m-%d}",
+                                                  date_max=f"{now + timedelta(days=1):%Y-%m-%d}", ttl=0)
+        metrics.inc("watch_polls_total", mode="full" if full else "window")
+
+        affected = set()
+        for competition in self.competitions:
+            finished = self.finished_games[competition.key]
+            if full:
+                finished[:] = export_pens.finished_ids(schedules[competition.key])
+            for game in schedules[competition.key]:
+                previous = self.states.get(game['id'])
+                self.states[game['id']] = game['etat']
+                start = game_start(game)
+                if start is not None:
+                    self.starts[game['id']] = start
+                if game['etat'] == 'T' and previous != 'T' and game['id'] not in finished:
+                    finished.append(game['id'])
+            # Only the games missing from the store are fetched: the transitions to finished,
+            # failed games once their retry is due and, on the first poll, every game finished since the last run
+            stored = export_pens.ingest(self.store, self.retry_queue, competition, finished)
+            if stored:
+                logger.info("%d %s games finished: %s", len(stored), competition.name, ", ".join(map(str, stored)))
+                metrics.inc("watch_games_total", len(stored), competition=competition.key)
+                affected.add(competition.key)
+        export_pens.cache.save()
+
+        if affected or full:
+            export_pens.update_aggregates(self.aggregates, self.store)
+            for competition in self.competitions:
+                if full or competition.key in affected:
+                    export_pens.render_competition(self.store, self.aggregates, competition, self.finished_games[competition.key], self.pages)
+            export_pens.render_index(self.store, self.competitions, self.finished_games, self.pages)
+        return affected
+
+    def interval(self, now: datetime = None) -> float:
+        """Seconds until the next poll: short while a game may be in progress, otherwise until the next start"""
+        now = now or datetime.now()
+        next_start = None
+        for game_id, start in self.starts.items():
+            if self.states.get(game_id) == 'T':
+                continue
+            if start <= now <= start + timedelta(seconds=GAME_DURATION):
+                return WATCH_ACTIVE_INTERVAL
+            if start > now and (next_start is None or start < next_start):
+                next_start = start
+        if next_start is not None:
+            return max(WATCH_ACTIVE_INTERVAL, min(WATCH_IDLE_INTERVAL, (next_start - now).total_seconds()))
+        return WATCH_IDLE_INTERVAL
+
+    def run(self, stop: threading.Event):
+        while not stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                logger.exception("Poll failed", exc_info=e)
+                metrics.inc("watch_poll_failures_total")
+            metrics.write()
+            interval = self.interval()
+            logger.debug("Next poll in %.0f s", interval)
+            stop.wait(interval)
+
+
+def main(season: int = SEASON):
+    stop = threading.Event()
+    # Container stops send SIGTERM, finish the current poll then exit
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    try:
+        Watcher(season).run(stop)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    metrics.configure_logging()
+    main()